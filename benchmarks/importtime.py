@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Measures the startup cost of sat, using `python -X importtime`.
+
+Reports the cumulative import time of the slowest modules imported by
+sat.modules.main, whether any of the heavy dependencies (which are only
+imported once a scan needs them) were imported, and the wall time of
+`sat -V`, the cheapest invocation of the program.
+
+usage:
+    python benchmarks/importtime.py [--runs 20] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# only imported once a scan needs them.
+DEFERRED = ("requests", "urllib3", "icmplib")
+
+
+def importtime(module: str) -> list:
+    """
+    Returns (cumulative us, self us, module) of every module that
+    importing `module` imports, read from `python -X importtime`.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+
+    imports = []
+    for line in process.stderr.splitlines():
+        # e.g: "import time:       359 |       3223 |   icmplib"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        (own, cumulative, name) = line.removeprefix("import time:").split("|")
+        imports.append((int(cumulative), int(own), name.strip()))
+    return imports
+
+
+def wall_time(args: list, runs: int) -> float:
+    """
+    Returns the median wall time (in ms) of running sat with args.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "sat/__main__.py", *args], cwd=ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start)*1000)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", default=20, type=int)
+    parser.add_argument("--top", default=15, type=int)
+    bench = parser.parse_args()
+
+    # leave out the modules that the interpreter imports on startup.
+    startup = {name for (_, _, name) in importtime("sys")}
+    imports = [(cumulative, own, name) for (cumulative, own, name)
+               in importtime("sat.modules.main") if name not in startup]
+    total = sum(own for (_, own, _) in imports)
+    print(f"import sat.modules.main: {total/1000:.1f}ms, "
+          f"{imports.__len__()} modules")
+    for (cumulative, own, name) in sorted(imports, reverse=True)[:bench.top]:
+        print(f"{cumulative/1000:>10.1f}ms {own/1000:>8.1f}ms  {name}")
+
+    deferred = sorted({name for (_, _, name) in imports
+                       if name.split(".")[0] in DEFERRED})
+    print(f"\ndeferred dependencies imported: {deferred or 'none'}")
+    print(f"sat -V: {wall_time(['-V'], bench.runs):.1f}ms "
+          f"(median of {bench.runs} runs)")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the worker pool scheduler in main.py against the previous
+thread-per-server scheduler, which joined the threads in inventory order.
+
+Both schedulers scan the same loopback inventory (127.0.0.0/8 is routed
+to the loopback interface on linux), and draw the table to /dev/null.
+The previous scheduler redrew the table after every joined thread, the
+worker pool redraws it from the render loop, like the real program does.
+
+usage:
+    python benchmarks/scheduler.py [--hosts 1000] [--workers 64]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sat.modules import connectivity, log, main  # noqa: E402
+
+PORTS = [22, 80, 443, 8080]
+
+
+def loopback_targets(hosts: int) -> list:
+    targets = []
+    for i in range(1, hosts+1):
+        ip = f"127.0.{i // 250}.{i % 250 + 1}"
+        connectivity.results.add_host(ip)
+        targets.append({"ip": ip, "ports": list(PORTS), "scan": True,
+                        "http_ports": None})
+    return targets
+
+
+def reset():
+    connectivity.results.clear()
+
+
+def thread_per_server(targets: list, timeout: float, args):
+    """
+    The scheduler that was used before the worker pool.
+    """
+    threads = []
+    for target in targets:
+        t = threading.Thread(target=connectivity.test,
+                             args=(target.get("ip"), target.get("ports"),
+                                   target.get("scan"), timeout))
+        t.daemon = True
+        threads.append(t)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout+1)
+        log.write(f"[Main Thread]: {thread} joined!")
+        main.Output.table(args.stderr, args.verbose, initial=False)
+
+
+def worker_pool(targets: list, timeout: float, args):
+    render_loop = main.Output.live_table(args.stderr, args.verbose, args.fps)
+    vars(main)["__scan_threads"](targets, timeout, args)
+    render_loop.stop()
+
+
+def measure(scheduler, hosts: int, timeout: float, args) -> tuple:
+    """
+    Returns the wall time of the scheduler, and the peak amount
+    of threads that were alive while it ran.
+    """
+    reset()
+    targets = loopback_targets(hosts)
+    peak = [threading.active_count()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.01):
+            peak[0] = max(peak[0], threading.active_count())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            scheduler(targets, timeout, args)
+            elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    return (elapsed, peak[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", default=1000, type=int)
+    parser.add_argument("--workers", default=64, type=int)
+    parser.add_argument("--timeout", default=1, type=float)
+    bench = parser.parse_args()
+
+    args = argparse.Namespace(stderr=False, verbose=False,
+                              engine="threads", workers=bench.workers,
+                              concurrency=bench.workers, deadline=0,
+                              fps=10)
+
+    for (name, scheduler) in (("thread per server", thread_per_server),
+                              (f"worker pool ({bench.workers})", worker_pool)):
+        (elapsed, peak) = measure(scheduler, bench.hosts, bench.timeout, args)
+        print(f"{name:>24}: {elapsed:.3f}s for {bench.hosts} hosts, "
+              f"peak threads: {peak}")
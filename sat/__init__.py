@@ -1,19 +1,26 @@
 # for setuptools to install the package.
-from .modules import (
-    main,
-    connectivity,
-    log,
-    errors,
-    toml,
-    tables,
-    ansi,
-    arguments,
-)
+# the modules are only imported once start() runs (see sat.py), so
+# that importing the package stays cheap.
 from .sat import start
 
 
+import importlib
 import os
 import pathlib
+import pkgutil
+
+# still importable as sat.<module>, but only once they are used.
+# listed from the modules folder, so that new modules are never left out.
+MODULES = tuple(module.name for module in pkgutil.iter_modules(
+    [os.path.join(os.path.dirname(__file__), "modules")]))
+
+
+def __getattr__(name: str):
+    if name not in MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".modules.{name}", __name__)
+    globals()[name] = module
+    return module
 
 
 def make_config():
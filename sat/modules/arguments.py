@@ -1,4 +1,5 @@
 import argparse
+import sys
 try:
     from sat.modules import toml
 except ModuleNotFoundError:
@@ -7,13 +8,36 @@ except ModuleNotFoundError:
 
 # NOT YET IMPLEMENTED
 
+# seconds per unit of a duration, e.g: 30s, 5m
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def duration(value: str) -> float:
+    """
+    parse a duration, in seconds unless it ends with a unit.
+    """
+    value = value.strip().lower()
+    unit = 1
+    if value[-1:] in UNITS:
+        (value, unit) = (value[:-1], UNITS.get(value[-1]))
+    try:
+        seconds = float(value) * unit
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"{value!r} is not a duration, such as 30, 30s or 5m")
+    if seconds < 0:
+        raise argparse.ArgumentTypeError("a duration can't be negative")
+    return seconds
+
 
 def parse(prog_name: str):
     """
     parse user arguments from STDIN.
     """
     parser = argparse.ArgumentParser(
-        usage=f'{prog_name} [options] [-t [custom_toml_file]]')
+        usage=f'{prog_name} [options] [-t [custom_toml_file]]\n'
+              f'       {prog_name} history [options] [host]\n'
+              f'       {prog_name} diff [options] old new')
     parser.add_argument("--stderr", "-s", default=False,
                         action="store_true",
                         help='''
@@ -27,6 +51,24 @@ def parse(prog_name: str):
                         default=False,
                         nargs=1,
                         help="outputs a log to the current directory, as a filename")
+    parser.add_argument("--log-level", "-l", default="info",
+                        choices=["info", "notice", "ok", "error"],
+                        help='''
+                        Least important messages to keep in the log,
+                        when it is printed or written out.
+                        ''')
+    parser.add_argument("--log-history", default=10000,
+                        type=int,
+                        help='''
+                        Amount of log messages kept in memory. The full
+                        log is only kept with --output-log.
+                        ''')
+    parser.add_argument("--log-rotate", default=0,
+                        type=float,
+                        help='''
+                        Rotate the --output-log file once it grows past
+                        this size (in MB), keeping 3 old files.
+                        ''')
     parser.add_argument("--new", "-n",
                         default=False,
                         nargs=1,
@@ -46,11 +88,223 @@ def parse(prog_name: str):
                         nargs="?",
                         type=int,
                         help="Set the timeout (in seconds)")
+    parser.add_argument("--format", "-f", default="table",
+                        choices=["table", "ndjson"],
+                        help='''
+                        "ndjson" writes a JSON object per server to
+                        STDOUT as soon as it is done, rather than the
+                        table.
+                        ''')
+    parser.add_argument("--per-port", default=False,
+                        action="store_true",
+                        help='''
+                        With --format ndjson, also write a JSON object
+                        for every scanned port.
+                        ''')
+    parser.add_argument("--store", default=None,
+                        nargs="?",
+                        const="",
+                        help='''
+                        Keep the results of the run in a SQLite database,
+                        read back with `history`. If none specified, uses
+                        results.db in the configuration directory.
+                        ''')
+    parser.add_argument("--incremental", default=0,
+                        nargs="?",
+                        const=10,
+                        type=int,
+                        help='''
+                        Only scan the servers that were not up in the
+                        results kept with --store, and the servers that
+                        were up once every INCREMENTAL (10) runs, then
+                        print what changed.
+                        ''')
+    parser.add_argument("--fps", default=10,
+                        type=float,
+                        help='''
+                        Most times per second that the table is redrawn
+                        while the scan runs.
+                        ''')
+    parser.add_argument("--viewport", default="auto",
+                        choices=["auto", "always", "never"],
+                        help='''
+                        Only draw the rows that fit on the terminal,
+                        failures first, with a summary. "auto" does so
+                        while the table is taller than the terminal.
+                        ''')
+    parser.add_argument("--daemon", "-d", default=False,
+                        action="store_true",
+                        help='''
+                        Keep running, and scan every server again once
+                        its `interval` (or --interval) has passed.
+                        ''')
+    parser.add_argument("--interval", "-i", default=60,
+                        type=float,
+                        help='''
+                        Time (in seconds) between the scans of a server
+                        with --daemon, unless it sets its own `interval`.
+                        ''')
+    parser.add_argument("--jitter", default=0.1,
+                        type=float,
+                        help='''
+                        Fraction of the interval that each scan is moved
+                        by at random, so that servers with the same
+                        interval are not all scanned at once.
+                        ''')
+    parser.add_argument("--engine", "-e", default="threads",
+                        choices=["threads", "asyncio"],
+                        help='''
+                        Scan engine to use. "threads" runs the servers on
+                        a pool of worker threads (see --workers), "asyncio"
+                        runs every probe on a single event loop.
+                        ''')
+    parser.add_argument("--concurrency", "-c", default=512,
+                        type=int,
+                        help='''
+                        Maximum amount of probes in flight at once during
+                        the ping sweep, and when using the asyncio engine.
+                        ''')
+    parser.add_argument("--workers", "-w", default=64,
+                        type=int,
+                        help='''
+                        Amount of worker threads used to scan servers
+                        when using the threads engine.
+                        ''')
+    parser.add_argument("--deadline", "-D", default=0,
+                        type=float,
+                        help='''
+                        Time (in seconds) the whole scan may take before
+                        unfinished servers are marked as timed out.
+                        If none specified, it is computed from the
+                        timeout and the amount of servers.
+                        ''')
+    parser.add_argument("--dns-ttl", default=300,
+                        type=float,
+                        help='''
+                        Time (in seconds) that resolved hostnames
+                        are cached for.
+                        ''')
+    parser.add_argument("--dns-cache", default=False,
+                        action="store_true",
+                        help='''
+                        Keep resolved hostnames on disk between runs, in
+                        the configuration directory.
+                        ''')
+    parser.add_argument("--max-age", default=0,
+                        type=duration,
+                        help='''
+                        Reuse the results of probes (from any run of sat)
+                        that are younger than this, e.g: 30s or 5m. They
+                        are cached in the configuration directory.
+                        ''')
+    parser.add_argument("--cache-size", default=100000,
+                        type=int,
+                        help='''
+                        Amount of probe results kept in the cache of
+                        --max-age, the least recently used are dropped.
+                        ''')
+    parser.add_argument("--adaptive-timeout", default=False,
+                        action="store_true",
+                        help='''
+                        Derive the connect timeouts of every server from
+                        its round trip times (as TCP does), so that
+                        filtered ports of fast servers time out sooner.
+                        -T stays the longest timeout.
+                        ''')
+    parser.add_argument("--min-timeout", default=0.05,
+                        type=float,
+                        help='''
+                        The shortest connect timeout (in seconds) of
+                        --adaptive-timeout.
+                        ''')
     parser.add_argument("--version", "-V", default=False,
                         action="store_true",
                         help="print the version")
     return parser.parse_args()
 
 
+# subcommands, which are parsed on their own.
+SUBCOMMANDS = ("history", "diff")
+
+
+def subcommand():
+    """
+    the subcommand that was invoked, or None.
+    """
+    if sys.argv[1:2] and sys.argv[1] in SUBCOMMANDS:
+        return sys.argv[1]
+    return None
+
+
+def parse_history(prog_name: str):
+    """
+    parse the arguments of the `history` subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        prog=f"{prog_name} history",
+        description="Reads back the results kept with --store.")
+    parser.add_argument("host", nargs="?", default=None,
+                        help='''
+                        Server (as written in the toml file) to print the
+                        results of. If none specified, prints the runs.
+                        ''')
+    parser.add_argument("--port", "-p", default=None,
+                        type=int,
+                        help="Print the results of a single port of the host.")
+    parser.add_argument("--status", default=None,
+                        choices=["up", "down"],
+                        help="Only print the results with this status.")
+    parser.add_argument("--last-down", default=False,
+                        action="store_true",
+                        help='''
+                        Print when the host (or port) last went down,
+                        and when it came back up.
+                        ''')
+    parser.add_argument("--limit", "-n", default=20,
+                        type=int,
+                        help="Amount of results to print.")
+    parser.add_argument("--store", default=None,
+                        help='''
+                        Database to read. If none specified, uses
+                        results.db in the configuration directory.
+                        ''')
+    return parser.parse_args(sys.argv[2:])
+
+
+def parse_diff(prog_name: str):
+    """
+    parse the arguments of the `diff` subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        prog=f"{prog_name} diff",
+        description="Prints what changed between the results of two scans.")
+    parser.add_argument("old", nargs="?", default=None,
+                        help='''
+                        Results written with --format ndjson, or the id
+                        of a run with --store.
+                        ''')
+    parser.add_argument("new", nargs="?", default=None,
+                        help='''
+                        Results written with --format ndjson, or the id
+                        of a run with --store.
+                        ''')
+    parser.add_argument("--store", default=None,
+                        nargs="?",
+                        const="",
+                        help='''
+                        Compare two runs of a database kept with --store,
+                        the latest two if none specified. If no database
+                        is specified, uses results.db in the configuration
+                        directory.
+                        ''')
+    parser.add_argument("--format", "-f", default="table",
+                        choices=["table", "ndjson"],
+                        help='''
+                        "ndjson" writes a JSON object per change to
+                        STDOUT, rather than the table.
+                        ''')
+    return parser.parse_args(sys.argv[2:])
+
+
 if __name__ == "__main__":
     parse("sat")
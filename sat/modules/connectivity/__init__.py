@@ -1,68 +1,243 @@
 """
 Handles all port testing, and ICMP responses.
 
-Generates a data structure for in/out connections, and for general port scans.
-uses the following key/value formula:
-
-    IP_address->
-        [{ICMP_response}, {Ports_list}] <-Array values
-
-For example, a list with connections will generate the following values:
-    127.0.0.1->
-        [True, [443,22]]
-also creates and stores the hashmap dictionaries for the program:
+Every probe writes its result to the `results` store of this module,
+which keeps a record per IP address (see the results module):
 ```py
-    # all hashmaps stored within connectivity.py
-    connectivity.connections={}
-    connectivity.open_ports ={}
-    connectivity.closed_ports ={}
+    # the store is accessible throughout the entire program
+    connectivity.results.snapshot()
 ```
+
+Two scan engines live in this module: the default one (`test()`) runs
+every server on one of a fixed pool of worker threads (see --workers),
+which probes all of its ports at once with `probe_ports()`, while the
+`async_*` coroutines run every probe on a single asyncio event loop,
+capped by a shared semaphore (see `--engine asyncio`).
 """
+import asyncio
+import collections
+import errno
+import heapq
+import importlib.util
+import selectors
 import socket
 import threading
 import time
+try:
+    import resource
+except ModuleNotFoundError:
+    # not on windows.
+    resource = None
 try:
     import sat.modules.log as log
     from sat.modules.errors import eprint
     import sat.modules.errors as errors
+    import sat.modules.probecache as probecache
+    from sat.modules.results import ScanResults, UP, DOWN
 except ModuleNotFoundError:
     import modules.log as log
     from modules.errors import eprint
     import modules.errors as errors
-# try importing our external dependencies
-try:
-    has_dep1 = False
-    has_dep2 = False
+    import modules.probecache as probecache
+    from modules.results import ScanResults, UP, DOWN
+# our external dependencies are only imported once a scan needs them,
+# so that `sat -V` or `sat -n` never pay for importing them. requests
+# (urllib3, certifi, ...) is only imported by the first HTTP probe.
+icmplib = None
+requests = None
+
+
+def load_dependencies() -> None:
+    """
+    Checks that our external dependencies are installed, exits with
+    a notice if they are not, and imports icmplib.
+    """
+    global icmplib
+    if icmplib is not None:
+        return
+
+    # find_spec() looks for the package without importing it.
+    missing = [name for name in ("icmplib", "requests")
+               if importlib.util.find_spec(name) is None]
+    if missing:
+        """
+        Use the built-in dependencies
+        NOTICE: these packages were installed
+        through the venv, and are not updated.
+        Notify the user to try and install them
+        directly.
+        """
+        try:
+            import sat.modules.ansi as ansi
+        except ModuleNotFoundError:
+            import modules.ansi as ansi
+        eprint(f"{ansi.YELLOW}[NOTICE]{
+               ansi.END} install the dependencies please!:")
+        for name in missing:
+            print(name)
+        exit(1)
 
     import icmplib
-    has_dep1 = True
-    import requests
-    has_dep2 = True
-
-except ImportError:
-    """
-    Use the built-in dependencies
-    NOTICE: these packages were installed
-    through the venv, and are not updated.
-    Notify the user to try and install them
-    directly.
-    """
-    from . import ansi
-    eprint(f"{ansi.YELLOW}[NOTICE]{
-           ansi.END} install the dependencies please!:")
-    if not has_dep1:
-        print("icmplib")
-    if not has_dep2:
-        print("requests")
-    exit(1)
-
-# after imports we can safely delete these.
-del has_dep1, has_dep2
+
 
 # these are globally accessible throughout the entire program
-connections = {}
-open_ports = {}
-closed_ports = {}
+results = ScanResults()
+# ip->resolved address, filled in by the resolver before scanning.
+addresses = {}
+
+
+def address_of(ip_address: str) -> str:
+    """
+    Returns the address that the probes should connect to, so
+    that hostnames are not resolved again by every probe.
+    """
+    return addresses.get(ip_address, ip_address)
+
+
+def url_host(host: str) -> str:
+    """
+    Returns the host as it is written within a URL or a Host
+    header, IPv6 addresses are written within brackets.
+    """
+    if ":" in host:
+        return f"[{host}]"
+    return host
+
+
+class icmp:
+    """
+    Whether we are able to open privileged ICMP sockets,
+    detected once per process by privileged().
+    """
+    privileged = None
+    lock = threading.Lock()
+
+
+# every worker thread keeps its own pooled session.
+__workers = threading.local()
+
+
+class RTTEstimator:
+    """
+    The smoothed round trip time (srtt) of a host, and its variation
+    (rttvar), as estimated by TCP (Jacobson/Karels, see RFC 6298):
+    ```
+    rttvar = (1 - BETA)*rttvar + BETA*|srtt - rtt|
+    srtt = (1 - ALPHA)*srtt + ALPHA*rtt
+    timeout = srtt + K*rttvar
+    ```
+    Both are in ms, and None until the first sample. As with TCP, a
+    connection that times out is tried again, RETRIES more times at
+    most, doubling the timeout every time.
+    """
+    ALPHA = 1/8
+    BETA = 1/4
+    K = 4
+    RETRIES = 2
+    __slots__ = ("srtt", "rttvar")
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+
+    def sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+            return
+        self.rttvar = ((1 - self.BETA)*self.rttvar
+                       + self.BETA*abs(self.srtt - rtt))
+        self.srtt = (1 - self.ALPHA)*self.srtt + self.ALPHA*rtt
+
+    def timeout(self, floor: float, ceiling: float, attempt=0) -> float:
+        """
+        Returns the timeout (in seconds) of the attempt within
+        [floor, ceiling], or the ceiling if there are no samples yet.
+        """
+        if self.srtt is None:
+            return ceiling
+        estimate = (self.srtt + self.K*self.rttvar) / 1000
+        return min(max(estimate, floor) * 2**attempt, ceiling)
+
+
+class timeouts:
+    """
+    With --adaptive-timeout, the connect timeouts of every host are
+    derived from its round trip times, rather than being -T.
+
+    floor: the shortest timeout (in seconds).
+    estimators: ip->RTTEstimator, kept between the scans of --daemon.
+    """
+    adaptive = False
+    floor = 0.05
+    estimators = {}
+    lock = threading.Lock()
+
+
+def adaptive_timeouts(floor: float):
+    timeouts.adaptive = True
+    timeouts.floor = floor
+
+
+def estimator(ip_address: str):
+    """
+    Returns the RTTEstimator of the host, or None if the
+    timeouts are not adaptive.
+    """
+    if not timeouts.adaptive:
+        return None
+    with timeouts.lock:
+        return timeouts.estimators.setdefault(ip_address, RTTEstimator())
+
+
+def connect_timeout(ip_address: str, timeout: float, attempt=0) -> float:
+    """
+    Returns the timeout of a connection to the host, no longer than
+    `timeout`, and just as long if the timeouts are not adaptive.
+    """
+    host = estimator(ip_address)
+    if host is None:
+        return timeout
+    return host.timeout(timeouts.floor, timeout, attempt)
+
+
+def session() -> "requests.Session":
+    """
+    Returns the requests.Session of the calling thread. Sessions keep
+    their connections alive between requests, and are not safe to share
+    across threads, so we create one per worker.
+    """
+    global requests
+    http_session = getattr(__workers, "session", None)
+    if http_session is None:
+        if requests is None:
+            import requests
+        http_session = requests.Session()
+        __workers.session = http_session
+    return http_session
+
+
+def __record_http(ip_address: str, port: int, status: int, ttfb: float):
+    """
+    Stores the status code, and the time to first byte (in ms) of
+    an HTTP response.
+    """
+    results.record_http(ip_address, port, status, ttfb)
+    log.info("Connected to ", port, " via HTTP on ", ip_address,
+             ", status=", status, ", ttfb=", round(ttfb, 1), "ms")
+
+
+def __cached_http(ip_address: str, port: int, cached: tuple) -> bool:
+    """
+    Records the HTTP response of a fresh probecache entry,
+    "none" if the port did not answer over HTTP.
+    """
+    (status, ttfb, _, _) = cached
+    if status == "none":
+        return False
+    log.info("[http]: ", ip_address, ":", port, " answered recently (cached)")
+    __record_http(ip_address, port, int(status), ttfb)
+    return True
 
 
 def test_http(ip_address: str, port: int, main_timeout: int) -> bool:
@@ -72,32 +247,46 @@ def test_http(ip_address: str, port: int, main_timeout: int) -> bool:
     may at a later date add a feature to catch this response, and
     return a message to the user with more details on the response.
     """
-    log.notify(f"attempting to connect via http to {
-               ip_address} on port {port}...")
+    cached = probecache.lookup(address_of(ip_address), port, probecache.HTTP)
+    if cached is not None:
+        return __cached_http(ip_address, port, cached)
+
+    log.notify("attempting to connect via http to ",
+               ip_address, " on port ", port, "...")
+    # imports requests before the except clauses below refer to it.
+    http_session = session()
     # stores the value for the true response.
     http_response = False
 
     try:
-        status = requests.get(
-            f"http://{ip_address}:{port}", timeout=main_timeout)
+        # HEAD only waits for the headers, and never downloads a body.
+        # only connecting depends on the round trip time, the response
+        # depends on the server.
+        status = http_session.head(
+            f"http://{url_host(address_of(ip_address))}:{port}",
+            timeout=(connect_timeout(ip_address, main_timeout), main_timeout),
+            headers={"Host": f"{url_host(ip_address)}:{port}"},
+            allow_redirects=False)
 
         # previous function can fail.
-        log.write(f"[http]: ABLE TO CONNECT VIA HTTP to {ip_address}:{port}!")
-        log.info(f"Connected to {port} via HTTP on {
-                 ip_address}, status={status}")
+        log.write("[http]: ABLE TO CONNECT VIA HTTP to ",
+                  ip_address, ":", port, "!")
+        ttfb = status.elapsed.total_seconds()*1000
+        __record_http(ip_address, port, status.status_code, ttfb)
+        probecache.put(address_of(ip_address), port, probecache.HTTP,
+                       f"{status.status_code}", ttfb)
+        status.close()
         del status
         http_response = True
 
     except requests.exceptions.Timeout:
-        log.error(
-            f"[http]: HTTP connection timed out for {
-                ip_address} on port {port}")
+        log.error("[http]: HTTP connection timed out for ",
+                  ip_address, " on port ", port)
         http_response = False
 
     except requests.exceptions.ConnectionError:
-        log.error(
-            f"[http]: HTTP reached max retries for {
-                ip_address} on port {port}")
+        log.error("[http]: HTTP reached max retries for ",
+                  ip_address, " on port ", port)
         http_response = False
 
     except Exception as e:
@@ -105,116 +294,320 @@ def test_http(ip_address: str, port: int, main_timeout: int) -> bool:
             f"HTTP connection to {port} for {ip_address} failed with the",
             f"following error message: {type(e).__name__}")
 
+    if not http_response:
+        probecache.put(address_of(ip_address), port, probecache.HTTP, "none")
     # free the memory, return the response
     del ip_address, port, main_timeout
     return http_response
 
 
-def __onConnect(sock: socket.socket, ip_address: str, port: int) -> bool:
-    log.write(f"[ports]: connected to {port} on {ip_address}!")
-    list_open: list = open_ports.get(ip_address)
-    list_closed: list = closed_ports.get(ip_address)
-    list_open.append(port)
-    list_closed.remove(port)
-    open_ports[ip_address] = list_open
-    closed_ports[ip_address] = list_closed
-    sock.close()
-
-
-def test_ports(ip_address: str,
-               port: int,
-               timeout: int,
-               SIGKILL: threading
-               .Event) -> None:
-    """
-    Test port connectivity, and appends them to a dictionary
-    """
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    result = sock.connect_ex((ip_address, port))
-    log.notify(f"scanning {ip_address} on {port}")
-    http_result = test_http(ip_address, port, timeout)
-    # connect
-    if result == 0 or http_result:
-        __onConnect(sock, ip_address, port)
-        return
+def __mark_open(ip_address: str, port: int) -> None:
+    """
+    Marks the port as open in the results.
+    """
+    log.write("[ports]: connected to ", port, " on ", ip_address, "!")
+    results.mark_open(ip_address, port)
 
-    while not SIGKILL.is_set():
-        if result == 0:
-            log.write(f"[ports]: connected to {port} on {ip_address}!")
-            __onConnect(sock, ip_address, port)
-            return
 
-    log.error(f"[ports]: unable to connect to {
-        port} on {ip_address} (THREAD TIMED OUT)...")
+# amount of ports of a single server probed at once by the asyncio engine.
+PORT_WORKERS = 256
+
+# connect_ex() return codes for a connection that is still in progress.
+CONNECTING = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+# how often (in seconds) probe_ports() checks whether it was stopped.
+STOP_CHECK = 0.1
 
+# errors of socket() once the process (or the system) is out of files.
+OUT_OF_FILES = (errno.EMFILE, errno.ENFILE)
 
-def ping(ip_address: str, main_timeout: int, max_packets_sent=5) -> bool:
+
+def socket_budget() -> int:
     """
-    Ping the given address with ICMP requests.
+    The amount of sockets that probe_ports() may keep open at once,
+    across every worker thread: half of the limit of open files (see
+    `ulimit -n`), leaving the rest to the log, the HTTP sessions, ...
+    """
+    if resource is None:
+        return 512
+    (soft, _) = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return 16384
+    return max(min(soft // 2, 16384), 8)
+
+
+class sockets:
+    """
+    The sockets that probe_ports() has open, across every worker.
     """
-    response = False
+    slots = threading.BoundedSemaphore(socket_budget())
 
-    # pings the server, on ICMP echo reply +=1
-    packets_received = 0
 
-    for packets_sent in range(1, max_packets_sent):
+def probe_ports(ip_address: str, ports, timeout: int,
+                batch_size=256, rtt=None, stop=None) -> dict:
+    """
+    Opens non-blocking TCP connections to the ports, and waits on all of
+    them at once with a selector (epoll on linux) instead of a thread per
+    port. At most `batch_size` sockets are in flight at any time, and
+    every socket takes one of the `sockets.slots` that all of the worker
+    threads share, so that they stay within the limit of open files.
+    Should the process run out of files anyway, the batch shrinks to the
+    sockets that are open, and the port is tried again.
+
+    Every connection times out on its own, `timeout` seconds after it
+    was started, which frees its slot of the batch for the next port.
+    Given the RTTEstimator of the host as `rtt`, it times out once the
+    estimated timeout passes instead, and is then tried again with twice
+    the timeout (see RTTEstimator.RETRIES). The handshakes that are
+    answered are fed back to it as samples.
+
+    Once the `stop` event (a threading.Event) is set, no more ports are
+    probed, and the ports that are left don't get a state at all. Neither
+    do the ports that could not be probed at all (e.g: out of files).
+
+    Returns a dictionary of port->state, where state is one of:
+        "open": the handshake completed.
+        "closed": the server refused the connection.
+        "filtered": nothing answered before the timeout.
+    """
+    states = {}
+    selector = selectors.DefaultSelector()
+    pending = iter(ports)
+    # (port, attempt) that are tried again before the pending ports.
+    retries = collections.deque()
+    # resolve the address once, rather than once per port.
+    (family, _, _, _, sockaddr) = socket.getaddrinfo(
+        ip_address, None, type=socket.SOCK_STREAM)[0]
+    address = sockaddr[0]
+    # port->time that the connection was started, and a heap of
+    # (time that the connection times out, port, attempt, socket).
+    started = {}
+    expiries = []
+
+    def stopped() -> bool:
+        return stop is not None and stop.is_set()
+
+    def take_slot() -> bool:
+        # only waits while none of the sockets of this probe are open,
+        # so that the workers never wait on each other while holding any.
+        if selector.get_map():
+            return sockets.slots.acquire(blocking=False)
+        while not stopped():
+            if sockets.slots.acquire(timeout=STOP_CHECK):
+                return True
+        return False
 
-        # here we check if we need to make a privilege socket
+    def close(sock):
+        sock.close()
+        sockets.slots.release()
+
+    def connect(port: int, attempt: int) -> bool:
+        """
+        Returns False if the batch can't take any more sockets.
+        """
+        nonlocal batch_size
+        sock = None
         try:
-            packets_received += icmplib.ping(
-                ip_address, count=1, interval=0.8,
-                timeout=main_timeout,
-                privileged=True).packets_received
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            result = sock.connect_ex((address, port))
+        except OSError as e:
+            if sock is not None:
+                sock.close()
+            sockets.slots.release()
+            in_flight = selector.get_map().__len__()
+            if e.errno in OUT_OF_FILES and in_flight:
+                # try again once the sockets that are open are closed.
+                batch_size = in_flight
+                retries.appendleft((port, attempt))
+                return False
+            log.error("[ports]: unable to probe ", port, " on ",
+                      ip_address, ": ", e)
+            return True
+        if result in CONNECTING:
+            selector.register(sock, selectors.EVENT_WRITE, port)
+            started[port] = time.monotonic()
+            expires = timeout
+            if rtt is not None:
+                expires = rtt.timeout(timeouts.floor, timeout, attempt)
+            heapq.heappush(expiries,
+                           (started[port] + expires, port, attempt, sock))
+            return True
+        states[port] = "open" if result == 0 else "closed"
+        close(sock)
+        return True
+
+    def refill():
+        while (selector.get_map().__len__() < batch_size
+               and not stopped()):
+            if retries:
+                (port, attempt) = retries.popleft()
+            else:
+                (port, attempt) = (next(pending, None), 0)
+                if port is None:
+                    return
+            if not take_slot():
+                retries.appendleft((port, attempt))
+                return
+            if not connect(port, attempt):
+                return
 
-        except icmplib.exceptions.SocketPermissionError:
-            packets_received += icmplib.ping(
-                ip_address, count=1, interval=0.8,
-                timeout=main_timeout,
-                privileged=False).packets_received
+    try:
+        refill()
+        while selector.get_map():
+            if stopped():
+                break
+            now = time.monotonic()
+            # connections that timed out on their own.
+            while expiries and expiries[0][0] <= now:
+                (_, port, attempt, sock) = heapq.heappop(expiries)
+                if port in states:
+                    continue
+                selector.unregister(sock)
+                close(sock)
+                # the SYN may have been dropped, send another one.
+                if rtt is not None and attempt < rtt.RETRIES:
+                    retries.appendleft((port, attempt + 1))
+                    continue
+                states[port] = "filtered"
+            refill()
+            if not selector.get_map():
+                break
+
+            remaining = max(expiries[0][0] - now, 0)
+            if stop is not None:
+                remaining = min(remaining, STOP_CHECK)
+            for (key, _) in selector.select(remaining):
+                sock = key.fileobj
+                result = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                states[key.data] = "open" if result == 0 else "closed"
+                if rtt is not None:
+                    rtt.sample((time.monotonic() - started.get(key.data))*1000)
+                selector.unregister(sock)
+                close(sock)
+            # refill the batch with the next ports.
+            refill()
+    finally:
+        for key in list(selector.get_map().values()):
+            close(key.fileobj)
+        selector.close()
+
+    return states
+
+
+def wants_http(port: int, http_ports) -> bool:
+    """
+    Checks if the port should be probed over HTTP once connected.
+    If the server does not define `http_ports`, every open port is.
+    """
+    return http_ports is None or port in http_ports
 
-        else:
-            raise errors.Connection.Privileges
 
-        # if by the second iteration, we have 0 packets_received just break.
-        if packets_received == 0 and packets_sent == 2:
-            break
+def test_ports(ip_address: str, ports: list, timeout: int,
+               http_ports=None, stop=None) -> None:
+    """
+    Test port connectivity, and writes the state of every port
+    to the `results` store.
 
-    # we subtact 1 from max_packets_sent to account for the 0 offset for
-    # iterables.
-    dropped = f"{(1.0-(packets_received/(max_packets_sent-1)))*100:.2f}%"
+    This runs in two stages, first every port is probed over TCP,
+    and then only the ports that connected (and are listed in
+    `http_ports`) are probed over HTTP. Both stages end early
+    once the `stop` event is set.
+    """
+    log.notify("scanning ", ip_address, " on ", ports)
+    address = address_of(ip_address)
+    # only the ports without a fresh result in the cache are probed.
+    (cached, ports) = probecache.split(address, ports)
+    states = probe_ports(address, ports, timeout,
+                         rtt=estimator(ip_address), stop=stop)
+    if states.__len__() < ports.__len__():
+        log.error("[ports]: ", ports.__len__() - states.__len__(),
+                  " ports of ", ip_address, " were not scanned, stopped")
+    for (port, state) in states.items():
+        probecache.put(address, port, probecache.TCP, state)
+    if cached:
+        log.info("[ports]: ", cached.__len__(), " ports of ",
+                 ip_address, " were checked recently (cached)")
+        states.update((port, state) for (port, (state, _, _, _))
+                      in cached.items())
+    connected = []
+
+    for (port, state) in states.items():
+        match state:
+            case "open":
+                __mark_open(ip_address, port)
+                connected.append(port)
+            case "closed":
+                log.error("[ports]: ", port, " on ",
+                          ip_address, " refused the connection...")
+            case _:
+                log.error("[ports]: unable to connect to ",
+                          port, " on ", ip_address, " (TIMED OUT)...")
+    del states
+
+    # second stage
+    for port in connected:
+        if stop is not None and stop.is_set():
+            return
+        if wants_http(port, http_ports):
+            test_http(ip_address, port, timeout)
 
-    log.notify(f"Pinged {ip_address} with {packets_sent}...")
 
-    if packets_received > 0:
-        log.write(f"[ping]: {ip_address} is up!")
-        response = True
+def privileged() -> bool:
+    """
+    Checks if we can open a privileged ICMP socket. Unprivileged
+    sockets let the kernel write the ICMP headers instead, so they
+    don't require root (see: net.ipv4.ping_group_range).
+    """
+    with icmp.lock:
+        if icmp.privileged is None:
+            load_dependencies()
+            try:
+                icmplib.ICMPv4Socket(privileged=True).close()
+                icmp.privileged = True
+            except icmplib.exceptions.SocketPermissionError:
+                icmp.privileged = False
+            log.info(f"[ping]: privileged ICMP sockets: {icmp.privileged}")
+    return icmp.privileged
+
+
+def sweep(ip_addresses, main_timeout: int, concurrency=512,
+          deadline=None, pings=None) -> dict:
+    """
+    Pings every address concurrently, see async_sweep().
+    """
+    return asyncio.run(async_sweep(
+        ip_addresses, main_timeout, asyncio.Semaphore(concurrency),
+        deadline, pings))
 
-    else:
-        log.error(f"{ip_address} responded with {packets_received} packets")
-    log.info(f"ip: {ip_address}, packet_loss:{
-        dropped}, timeout:{main_timeout}, packets_sent:{
-        packets_sent}")
 
-    # free the memory, return the response
-    del dropped, main_timeout, ip_address, packets_received
-    return response
+def ping(ip_address: str, main_timeout: int) -> bool:
+    """
+    Ping the given address with ICMP requests.
+    """
+    return sweep([ip_address], main_timeout).get(ip_address)
 
 
-def test(ip_address: str, ports, scan: bool, timeout=4) -> None:
+def test(ip_address: str, ports, scan: bool, timeout=4, alive=None,
+         http_ports=None, stop=None) -> None:
     """
     This is our "main" testing function, we load this function
-    with data from the parsed toml file. T
+    with data from the parsed toml file. If the address was already
+    pinged by sweep(), pass the result as `alive`. Setting the `stop`
+    event (e.g: at the deadline) makes the thread return early.
     """
 
     try:
         # ping the address:
-        ping_ok = ping(ip_address, timeout)
+        ping_ok = alive
+        if ping_ok is None:
+            ping_ok = ping(ip_address, timeout)
 
         if ping_ok:
-            connections[ip_address] = [True, ports]
+            results.set_status(ip_address, UP)
 
         else:
-            connections[ip_address] = [False, None]
+            results.set_status(ip_address, DOWN)
             return  # stop the thread
 
         del ping_ok
@@ -223,46 +616,19 @@ def test(ip_address: str, ports, scan: bool, timeout=4) -> None:
         # any errors in ping will just update the values
         # as if it never connected.
         log.error(f"[Test][Ping]: {e}")
-        connections[ip_address] = [False, None]
+        results.set_status(ip_address, DOWN)
         return False
 
     try:
         # we don't need to scan the ports if neither value.
         if ports is not None and scan:
-            port_list = connections.get(ip_address)[1]
-            list_open = []
-
-            open_ports[ip_address] = list_open
-            closed_ports[ip_address] = port_list
-            log.notify(f"checking port status on {
-                       ip_address} on ports: {ports}")
-
-            # create subthreads for port scanning
-            threads = []
-            log.start("Starting subthread: port scanner")
-            sigkill = threading.Event()
-            for port in port_list:
-                t = threading.Thread(
-                    target=test_ports,
-                    args=(ip_address, port, timeout, sigkill)
-                )
-                log.notify(f"loaded subthread {t} with values {
-                           ip_address}, {port}. {timeout}")
-                t.daemon = True
-                threads.append(t)
-
-            # start the subthreads
-            for thread in threads:
-                log.start(f"starting thread! {thread}")
-                thread.start()
-
-            # sets a timer
-            timer = 1
-            # sleep for timeout
-            time.sleep(timer)
-            sigkill.set()
-            for thread in threads:
-                thread.join()
+            results.set_ports(ip_address, ports)
+            log.notify("checking port status on ",
+                       ip_address, " on ports: ", ports)
+
+            # every port is probed from this thread, give slow
+            # handshakes at least a second to complete.
+            test_ports(ip_address, ports, max(timeout, 1), http_ports, stop)
 
             return
 
@@ -271,3 +637,271 @@ def test(ip_address: str, ports, scan: bool, timeout=4) -> None:
 
     # kill the thread
     return
+
+
+# ================ asyncio engine ================ #
+
+async def async_test_http(ip_address: str,
+                          port: int,
+                          reader: asyncio.StreamReader,
+                          writer: asyncio.StreamWriter,
+                          main_timeout: int) -> bool:
+    """
+    asyncio counterpart of test_http().
+
+    requests has no asyncio support, so we write a HEAD request onto the
+    already connected stream ourselves, and only read back the status line.
+    Reusing the stream from async_test_ports() saves a second handshake.
+    """
+    log.notify("attempting to connect via http to ",
+               ip_address, " on port ", port, "...")
+    http_response = False
+
+    try:
+        sent = time.perf_counter()
+        writer.write(f"HEAD / HTTP/1.0\r\nHost: {
+                     url_host(ip_address)}\r\n\r\n".encode())
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), main_timeout)
+        ttfb = (time.perf_counter() - sent)*1000
+
+        # e.g: b"HTTP/1.0 200 OK\r\n"
+        status = status.split()
+        if status.__len__() > 1 and status[0].startswith(b"HTTP/"):
+            log.write("[http]: ABLE TO CONNECT VIA HTTP to ",
+                      ip_address, ":", port, "!")
+            __record_http(ip_address, port, int(status[1]), ttfb)
+            probecache.put(address_of(ip_address), port, probecache.HTTP,
+                           status[1].decode(), ttfb)
+            http_response = True
+        del status
+
+    except TimeoutError:
+        log.error("[http]: HTTP connection timed out for ",
+                  ip_address, " on port ", port)
+
+    except Exception as e:
+        log.error(
+            f"HTTP connection to {port} for {ip_address} failed with the",
+            f"following error message: {type(e).__name__}")
+
+    if not http_response:
+        probecache.put(address_of(ip_address), port, probecache.HTTP, "none")
+    return http_response
+
+
+async def async_test_ports(ip_address: str,
+                           port: int,
+                           timeout: int,
+                           limit: asyncio.Semaphore,
+                           http_ports=None) -> None:
+    """
+    asyncio counterpart of test_ports(), opens a TCP connection to the
+    port, and on success, probes it over HTTP if it is in `http_ports`.
+    """
+    async with limit:
+        log.notify("scanning ", ip_address, " on ", port)
+        address = address_of(ip_address)
+        rtt = estimator(ip_address)
+        deadline = time.monotonic() + timeout
+        try:
+            attempt = 0
+            while True:
+                started = time.monotonic()
+                try:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(address, port),
+                        min(connect_timeout(ip_address, timeout, attempt),
+                            deadline - started))
+                    break
+                except TimeoutError:
+                    # the SYN may have been dropped, send another one.
+                    if (rtt is None or attempt >= rtt.RETRIES
+                            or time.monotonic() >= deadline):
+                        raise
+                    attempt += 1
+            if rtt is not None:
+                rtt.sample((time.monotonic() - started)*1000)
+        except (OSError, TimeoutError) as e:
+            # a refused connection was answered all the same.
+            if rtt is not None and isinstance(e, ConnectionRefusedError):
+                rtt.sample((time.monotonic() - started)*1000)
+            log.error("[ports]: unable to connect to ",
+                      port, " on ", ip_address, "...")
+            probecache.put(address, port, probecache.TCP,
+                           "filtered" if isinstance(e, TimeoutError)
+                           else "closed")
+            return
+
+        probecache.put(address, port, probecache.TCP, "open")
+        __mark_open(ip_address, port)
+        if wants_http(port, http_ports):
+            await async_test_http(ip_address, port, reader, writer, timeout)
+        writer.close()
+
+
+async def async_ping(ip_address: str,
+                     main_timeout: int,
+                     limit: asyncio.Semaphore,
+                     packets=2,
+                     pings=None) -> bool:
+    """
+    asyncio counterpart of ping(), using icmplib's async_ping().
+    Records the round trip time and packet loss in the results,
+    or as ip->(rtt, loss) in `pings` if given.
+    """
+    load_dependencies()
+    try:
+        async with limit:
+            host = await icmplib.async_ping(
+                address_of(ip_address), count=packets, interval=0.5,
+                timeout=main_timeout, privileged=privileged())
+
+    except icmplib.exceptions.SocketPermissionError:
+        log.error(f"[Ping]: {ip_address}: {
+                  errors.Connection.Privileges().message}")
+        return False
+
+    except Exception as e:
+        # any errors in ping will just update the values
+        # as if it never connected.
+        log.error(f"[Ping]: {ip_address}: {type(e).__name__} {e}")
+        return False
+
+    if pings is None:
+        results.record_ping(ip_address, host.avg_rtt, host.packet_loss)
+    else:
+        pings[ip_address] = (host.avg_rtt, host.packet_loss)
+    rtt = estimator(ip_address)
+    if rtt is not None:
+        for sample in host.rtts:
+            rtt.sample(sample)
+    probecache.put(address_of(ip_address), 0, probecache.PING,
+                   "up" if host.is_alive else "down",
+                   host.avg_rtt, host.packet_loss)
+    log.notify("Pinged ", ip_address, " with ", packets, "...")
+    log.info("ip: ", ip_address,
+             ", packet_loss:", round(host.packet_loss*100, 2),
+             "%, rtt:", host.avg_rtt, "ms, timeout:", main_timeout,
+             ", packets_sent:", host.packets_sent)
+
+    if host.is_alive:
+        log.write("[ping]: ", ip_address, " is up!")
+    else:
+        log.error(ip_address, " responded with ",
+                  host.packets_received, " packets")
+    return host.is_alive
+
+
+async def async_sweep(ip_addresses,
+                      main_timeout: int,
+                      limit: asyncio.Semaphore,
+                      deadline=None,
+                      pings=None) -> dict:
+    """
+    Pings every address concurrently on the running event loop,
+    rather than one packet at a time per server. The pings that are
+    still running at the deadline (a time.monotonic() value) are
+    cancelled.
+
+    Returns a dictionary of ip->bool, or ip->None for the addresses
+    that were not pinged before the deadline. The round trip times and
+    packet loss of every address are kept in the results, or in `pings`
+    if given (e.g: for the addresses of a network, which have no record
+    before they are known to be up).
+    """
+    ip_addresses = list(dict.fromkeys(ip_addresses))
+    alive = {}
+    for ip_address in ip_addresses:
+        cached = probecache.lookup(address_of(ip_address), 0, probecache.PING)
+        if cached is not None:
+            (status, rtt, loss, _) = cached
+            if pings is None:
+                results.record_ping(ip_address, rtt, loss)
+            else:
+                pings[ip_address] = (rtt, loss)
+            alive[ip_address] = status == "up"
+            host = estimator(ip_address)
+            if host is not None and rtt is not None:
+                host.sample(rtt)
+    if alive:
+        log.info(f"[ping]: {alive.__len__()} addresses were "
+                 "pinged recently (cached)")
+
+    pending = [ip_address for ip_address in ip_addresses
+               if ip_address not in alive]
+    log.notify(f"[ping]: sweeping {pending.__len__()} addresses...")
+    if pending:
+        privileged()
+        tasks = [asyncio.ensure_future(
+            async_ping(ip_address, main_timeout, limit, pings=pings))
+            for ip_address in pending]
+        remaining = None
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0)
+        (_, late) = await asyncio.wait(tasks, timeout=remaining)
+        for task in late:
+            task.cancel()
+        if late:
+            log.error(f"[ping]: {late.__len__()} addresses were not "
+                      "pinged before the deadline!")
+        alive.update((ip_address, task.result()) for (ip_address, task)
+                     in zip(pending, tasks) if task not in late)
+    return {ip_address: alive.get(ip_address) for ip_address in ip_addresses}
+
+
+async def async_test(ip_address: str,
+                     ports,
+                     scan: bool,
+                     timeout: int,
+                     limit: asyncio.Semaphore,
+                     alive=None,
+                     http_ports=None) -> None:
+    """
+    asyncio counterpart of test(). Every probe shares the `limit`
+    semaphore, which caps the amount of sockets open at once.
+    """
+    if alive is None:
+        alive = await async_ping(ip_address, timeout, limit)
+    if not alive:
+        results.set_status(ip_address, DOWN)
+        return
+    results.set_status(ip_address, UP)
+
+    try:
+        if ports is not None and scan:
+            results.set_ports(ip_address, ports)
+            log.notify("checking port status on ",
+                       ip_address, " on ports: ", ports)
+
+            # ports with a fresh result in the cache are not probed,
+            # unless they are still missing their HTTP probe.
+            (cached, ports) = probecache.split(address_of(ip_address), ports)
+            for (port, (state, _, _, _)) in cached.items():
+                if state != "open":
+                    continue
+                http = None
+                if wants_http(port, http_ports):
+                    http = probecache.lookup(address_of(ip_address), port,
+                                             probecache.HTTP)
+                    if http is None:
+                        ports.append(port)
+                        continue
+                __mark_open(ip_address, port)
+                if http is not None:
+                    __cached_http(ip_address, port, http)
+
+            # the ports are expanded lazily, a fixed amount of
+            # workers share the same iterator.
+            pending = iter(ports)
+
+            async def worker():
+                for port in pending:
+                    await async_test_ports(
+                        ip_address, port, timeout, limit, http_ports)
+
+            await asyncio.gather(*(
+                worker() for _ in range(min(PORT_WORKERS, len(ports)))))
+
+    except Exception as e:
+        log.error(e)
@@ -0,0 +1,214 @@
+"""
+Compares the results of two scans (`sat diff`), either two files
+written with `--format ndjson`, or two runs kept with `--store`:
+```
+$ sat -f ndjson > old.json; sat -f ndjson > new.json
+$ sat diff old.json new.json
+$ sat diff --store 12 15
+```
+Both sides are read into lists of hosts sorted by ip, which are joined
+in a single pass (a sorted-merge join), rather than looking every host
+of one side up in the other. The ports of a host are only compared one
+by one when they differ.
+"""
+import json
+import sys
+try:
+    import sat.modules.ansi as ansi
+except ModuleNotFoundError:
+    import modules.ansi as ansi
+
+
+class Results:
+    """
+    The results of one side of the diff, as a list of (ip, (status,
+    ports)) sorted by ip. ports is either {port: state}, or the
+    (open_ports, closed_ports) of a line of --format ndjson, which
+    is only expanded if it differs from the other side.
+    """
+    __slots__ = ("hosts",)
+
+    def __init__(self, hosts: dict, ports: dict):
+        # sorting the rows of a run, which are already in order, is O(n).
+        self.hosts = sorted((ip, (status, ports.get(ip)))
+                            for (ip, status) in hosts.items())
+
+
+def __parse_line(path: str, number: int, line: str):
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise ValueError(f"{path}:{number} is not a result of sat")
+
+
+def read_ndjson(path: str) -> Results:
+    """
+    Reads a file written with --format ndjson. The ports of a host are
+    read from its --per-port lines if there are any, otherwise from its
+    open_ports and closed_ports. Raises an OSError if the file can't be
+    read, and a ValueError if it isn't NDJSON.
+    """
+    with open(path, "r") as ndjson_file:
+        lines = [line for line in ndjson_file if line.strip()]
+    try:
+        # a single call to the decoder, rather than one per line.
+        rows = json.loads("[" + ",".join(lines) + "]")
+    except ValueError:
+        rows = [__parse_line(path, number, line)
+                for (number, line) in enumerate(lines, 1)]
+
+    hosts = {}
+    listed = {}
+    per_port = {}
+    for (number, row) in enumerate(rows, 1):
+        if not isinstance(row, dict) or "ip" not in row:
+            raise ValueError(f"{path}:{number} is not a result of sat")
+        ip = row.get("ip")
+        if "port" in row:
+            per_port.setdefault(ip, {})[row.get("port")] = row.get("state")
+            continue
+        hosts[ip] = row.get("status")
+        # networks only list the ports that are open on any member.
+        if "closed_ports" in row:
+            listed[ip] = (tuple(row.get("open_ports") or ()),
+                          tuple(row.get("closed_ports") or ()))
+    listed.update(per_port)
+    return Results(hosts, listed)
+
+
+def read_run(db, run: int) -> Results:
+    """
+    Reads a run of a --store database (see the history module). With
+    --daemon, a host may be stored many times within a run, the latest
+    results are kept.
+    """
+    hosts = {ip: status for (ip, status) in db.execute(
+        "SELECT ip, status FROM hosts WHERE run = ? ORDER BY ip, time",
+        (run,))}
+    ports = {}
+    for (ip, port, state) in db.execute(
+            "SELECT ip, port, state FROM ports WHERE run = ?"
+            " ORDER BY ip, port, time", (run,)):
+        ports.setdefault(ip, {})[port] = state
+    return Results(hosts, ports)
+
+
+def merge(old: list, new: list):
+    """
+    Joins two lists of (key, value) sorted by key in a single pass.
+    Yields (key, old value, new value), with None as the value of a
+    key that is missing from either side.
+    """
+    (i, j) = (0, 0)
+    while i < old.__len__() and j < new.__len__():
+        (old_key, old_value) = old[i]
+        (new_key, new_value) = new[j]
+        if old_key == new_key:
+            yield (old_key, old_value, new_value)
+            i += 1
+            j += 1
+        elif old_key < new_key:
+            yield (old_key, old_value, None)
+            i += 1
+        else:
+            yield (new_key, None, new_value)
+            j += 1
+    for (key, value) in old[i:]:
+        yield (key, value, None)
+    for (key, value) in new[j:]:
+        yield (key, None, value)
+
+
+def __states(ports) -> dict:
+    """
+    Returns {port: state} of either form of the ports of a host.
+    """
+    if ports is None:
+        return {}
+    if isinstance(ports, dict):
+        return ports
+    (open_ports, closed_ports) = ports
+    states = dict.fromkeys(closed_ports, "closed")
+    states.update(dict.fromkeys(open_ports, "open"))
+    return states
+
+
+def __change(old, new, gained: str, lost: str) -> str:
+    if old is None:
+        return "added"
+    if new is None:
+        return "removed"
+    if new == gained:
+        return gained if gained == "up" else "opened"
+    if old == gained:
+        return lost
+    return "changed"
+
+
+def changes(old: Results, new: Results) -> list:
+    """
+    Returns (ip, port, change, old, new) of every host and port whose
+    state differs, port being None for hosts. A change is one of: "up",
+    "down", "opened", "closed", "added", "removed" or "changed".
+
+    Only the ports of hosts whose ports differ are compared one by one.
+    Ports that were added or removed along with a change of their host
+    (e.g: a host that went down) are left out, the change of the host
+    says as much.
+    """
+    found = []
+    for (ip, was, now) in merge(old.hosts, new.hosts):
+        (was_status, was_ports) = was or (None, None)
+        (status, ports) = now or (None, None)
+        host_changed = was_status != status
+        if host_changed:
+            found.append((ip, None, __change(was_status, status, "up", "down"),
+                          was_status, status))
+        if was_ports == ports:
+            continue
+
+        (was_states, states) = (__states(was_ports), __states(ports))
+        for port in sorted(was_states.keys() | states.keys()):
+            (was_state, state) = (was_states.get(port), states.get(port))
+            if was_state == state:
+                continue
+            change = __change(was_state, state, "open", "closed")
+            if change in ("added", "removed") and host_changed:
+                continue
+            found.append((ip, port, change, was_state, state))
+    return found
+
+
+def __colored(change: str, text: str) -> str:
+    if not sys.stdout.isatty():
+        return text
+    match change:
+        case "up" | "opened" | "added":
+            return f"{ansi.GREEN}{text}{ansi.END}"
+        case "down" | "closed" | "removed":
+            return f"{ansi.RED}{text}{ansi.END}"
+    return text
+
+
+def print_changes(found: list, output_format="table"):
+    """
+    Prints the changes to STDOUT, as a table or as NDJSON.
+    """
+    if output_format == "ndjson":
+        sys.stdout.write("".join(
+            json.dumps({"ip": ip, "port": port, "change": change,
+                        "old": was, "new": now},
+                       separators=(",", ":")) + "\n"
+            for (ip, port, change, was, now) in found))
+        return
+
+    if not found:
+        print("no changes")
+        return
+    print(f"{'target':<30}  {'change':<8}  {'old':<8}  new")
+    for (ip, port, change, was, now) in found:
+        target = ip if port is None else f"{ip}:{port}"
+        # pad before coloring, the escape codes have no width.
+        print(f"{target:<30}  {__colored(change, f'{change:<8}')}  "
+              f"{was or '-':<8}  {now or '-'}")
+    print(f"\n{found.__len__()} changes")
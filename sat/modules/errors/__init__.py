@@ -7,8 +7,10 @@ from threading import Thread
 import traceback
 try:
     import sat.modules.ansi as ansi
+    import sat.modules.portranges as portranges
 except ModuleNotFoundError:
     import modules.ansi as ansi
+    import modules.portranges as portranges
 
 
 def eprint(*args, **kwargs):
@@ -30,50 +32,43 @@ class Check():
             case _:
                 raise scan_error.IncorrectType(server_id)
 
-    def ports(self, ports, server_id) -> bool:
+    def ports(self, ports, server_id):
         """
         Checks the values of the ports, if any return an
         error, deal with outside of this method.
-        """
-        MIN_PORT = 1
-        MAX_PORT = 65535
 
+        Returns the ports as portranges.PortRanges, which drops
+        duplicate values, and sorts the ports.
+        """
         port_errors = ConnectivityDefinitions.Ports
 
         match ports:
-            case list():
-                # checks if all in port list are integers.
-                # if all is well, sort the list.
-                ports_all_ints = all(isinstance(port, int) for port in ports)
-
-                if not ports_all_ints:
+            # if neither matches...
+            case None:
+                return None
+            case _:
+                try:
+                    return portranges.parse(ports)
+                except TypeError:
                     raise port_errors.IncorrectType(server_id)
-
-                # we also need to drop duplicate values, so we have to convert
-                # the list into a dictionary and back into a list.
-
-                ports = list(dict.fromkeys(ports))
-                ports.sort()
-
-                # check the values to ensure all are within valid ports
-                all_valid = all(MIN_PORT <= port <= MAX_PORT for port in ports)
-
-                if not all_valid:
+                except ValueError:
                     raise port_errors.PortOutOfRange(server_id)
-                return ports
 
-            case int():
-                # since we are iterating over this reduces overhead
-                port_to_list = []
-                if ports <= 0 or MAX_PORT < ports:
-                    raise port_errors.PortOutOfRange(server_id)
-                port_to_list.append(ports)
-                return port_to_list
-            # if neither matches...
+    def interval(self, interval, server_id):
+        """
+        Checks the interval (in seconds) between the scans
+        of a server with --daemon, None if not set.
+        """
+        interval_error = ConnectivityDefinitions.Interval
+        match interval:
             case None:
-                pass
+                return None
+            case bool():
+                raise interval_error.IncorrectType(server_id)
+            case int() | float() if interval > 0:
+                return float(interval)
             case _:
-                raise port_errors.IncorrectType(server_id)
+                raise interval_error.IncorrectType(server_id)
 
     def ip(self, ip, server_id):
         """
@@ -351,7 +346,8 @@ class ConnectivityDefinitions(Exception):
                     self.traceback}{ansi.END}"
 
             def __init__(self, server_name,
-                         message="port(s) must be type 'int' or list[int]",
+                         message="port(s) must be an int, a range, a group"
+                         " name, or a list of them",
                          code=3004):
                 self.server_name = server_name
                 self.message = message
@@ -373,3 +369,18 @@ class ConnectivityDefinitions(Exception):
                 self.code = code
                 self.traceback = traceback.format_exc()
                 super().__init__(message)
+
+    class Interval(Exception):
+        class IncorrectType(Exception):
+            def __str__(self):
+                return f"{self.server_name}: {self.message}\n{ansi.RED}{
+                    self.traceback}{ansi.END}"
+
+            def __init__(self, server_name,
+                         message="Interval must be a number of seconds above 0",
+                         code=3006):
+                self.server_name = server_name
+                self.message = message
+                self.code = code
+                self.traceback = traceback.format_exc()
+                super().__init__(message)
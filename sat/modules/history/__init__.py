@@ -0,0 +1,452 @@
+"""
+Keeps the results of every run in a SQLite database (--store), so that
+they are still around once the table is gone, and answers questions
+about them with `sat history`:
+
+```
+$ sat --store results.db
+$ sat history example.com --port 443 --last-down
+```
+Every run gets a row in `runs`, every server (and member of a network)
+a row in `hosts`, and every scanned port a row in `ports`. The rows are
+written from a thread of their own, every row that is queued up is
+inserted within a single transaction.
+"""
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import os
+from datetime import datetime
+try:
+    import sat.modules.ansi as ansi
+    import sat.modules.log as log
+    import sat.modules.toml as toml
+    from sat.modules.results import AWAITING, UP, DOWN
+except ModuleNotFoundError:
+    import modules.ansi as ansi
+    import modules.log as log
+    import modules.toml as toml
+    from modules.results import AWAITING, UP, DOWN
+
+STATUSES = {AWAITING: "awaiting", UP: "up", DOWN: "down"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    version TEXT,
+    toml TEXT,
+    hosts INTEGER
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    time REAL NOT NULL,
+    ip TEXT NOT NULL,
+    network TEXT,
+    status TEXT NOT NULL,
+    rtt REAL,
+    loss REAL
+);
+CREATE TABLE IF NOT EXISTS ports (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    time REAL NOT NULL,
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    http INTEGER,
+    ttfb REAL
+);
+CREATE INDEX IF NOT EXISTS hosts_by_ip ON hosts (ip, time);
+CREATE INDEX IF NOT EXISTS hosts_by_run ON hosts (run, ip);
+CREATE INDEX IF NOT EXISTS ports_by_ip ON ports (ip, port, time);
+CREATE INDEX IF NOT EXISTS ports_by_run ON ports (run, ip);
+"""
+
+
+def get_store_path() -> str:
+    """
+    The default database lives next to the default servers.toml
+    """
+    return os.path.join(os.path.dirname(toml.get_toml_path()), "results.db")
+
+
+def connect(path: str, create=True) -> sqlite3.Connection:
+    """
+    Opens the database, creating its tables if needed. Raises a
+    FileNotFoundError if it doesn't exist and create is False, and
+    a sqlite3.Error if the file isn't a database.
+    """
+    if not create and not os.path.exists(path):
+        raise FileNotFoundError(path)
+    db = sqlite3.connect(path, check_same_thread=False)
+    # the readers (sat history) never block the writer, and the
+    # writer only syncs at checkpoints rather than every commit.
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+def host_rows(run: int, record, network=None, done_at=None) -> list:
+    """
+    Returns the rows of the hosts table for a results.HostRecord.
+    """
+    return [(run, done_at, record.ip, network,
+             STATUSES.get(record.status, "awaiting"), record.rtt, record.loss)]
+
+
+def port_rows(run: int, record, done_at=None) -> list:
+    """
+    Returns a row of the ports table for every scanned port of the record.
+    """
+    if record.ports is None:
+        return []
+    rows = []
+    http = record.http or {}
+    for port in record.ports.ports:
+        (status, ttfb) = http.get(port, (None, None))
+        state = "open" if record.ports.is_open(port) else "closed"
+        rows.append((run, done_at, record.ip, port, state, status, ttfb))
+    return rows
+
+
+class Writer:
+    """
+    Subscribes to the hosts that are done in a results.ScanResults
+    store, and inserts their rows from a thread of its own. Every
+    record that is queued up is inserted within one transaction, so
+    that the scan never waits on the disk.
+    """
+
+    def __init__(self, results, path: str, version=None, toml_file=None):
+        self.path = path
+        self.db = connect(path)
+        with self.db:
+            self.run = self.db.execute(
+                "INSERT INTO runs (started, version, toml) VALUES (?, ?, ?)",
+                (time.time(), version, toml_file)).lastrowid
+        self.hosts = 0
+        self.rows = 0
+        # ip->the run that the results of the host are carried over from.
+        self.carried = {}
+        self.records = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.__write,
+                                       name="sat-history", daemon=True)
+        results.subscribe_done(self.__done)
+
+    def carry(self, ip: str, run: int):
+        """
+        For hosts whose results were carried over from a previous run
+        (see --incremental): once the host is done, its rows of that run
+        are copied into this run, as they are, rather than stored as if
+        it had been scanned. They keep the time that they were scanned.
+        """
+        self.carried[ip] = run
+
+    def __done(self, record, network):
+        self.records.put((record, network, time.time()))
+
+    def __write(self):
+        while True:
+            batch = [self.records.get()]
+            while True:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+
+            hosts = []
+            ports = []
+            carried = []
+            for item in batch:
+                if item is None:
+                    continue
+                (record, network, done_at) = item
+                if network is None and record.ip in self.carried:
+                    carried.append((record.ip, self.carried.get(record.ip)))
+                    continue
+                hosts.extend(host_rows(self.run, record, network, done_at))
+                ports.extend(port_rows(self.run, record, done_at))
+            self.__insert(hosts, ports, carried)
+            if None in batch:
+                return
+
+    def __insert(self, hosts: list, ports: list, carried: list):
+        if not hosts and not ports and not carried:
+            return
+        try:
+            with self.db:
+                self.db.executemany(
+                    "INSERT INTO hosts VALUES (?, ?, ?, ?, ?, ?, ?)", hosts)
+                self.db.executemany(
+                    "INSERT INTO ports VALUES (?, ?, ?, ?, ?, ?, ?)", ports)
+                copied = sum(self.__copy(ip, run) for (ip, run) in carried)
+            self.hosts += hosts.__len__() + carried.__len__()
+            self.rows += hosts.__len__() + ports.__len__() + copied
+        except sqlite3.Error as e:
+            log.error("[history]: could not store ",
+                      hosts.__len__() + carried.__len__(), " hosts: ", e)
+
+    def __copy(self, ip: str, run: int) -> int:
+        """
+        Copies the latest rows of the host in `run` into this run,
+        returns the amount of rows copied.
+        """
+        copied = self.db.execute(
+            "INSERT INTO hosts SELECT ?, time, ip, network, status, rtt, loss"
+            " FROM hosts WHERE run = ? AND ip = ? ORDER BY time DESC LIMIT 1",
+            (self.run, run, ip)).rowcount
+        copied += self.db.execute(
+            "INSERT INTO ports SELECT ?, time, ip, port, state, http, ttfb"
+            " FROM ports WHERE run = ? AND ip = ? AND time = (SELECT max(time)"
+            " FROM hosts WHERE run = ? AND ip = ?)",
+            (self.run, run, ip, run, ip)).rowcount
+        return copied
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """
+        Inserts the records that are still queued up, marks the run
+        as finished, and closes the database.
+        """
+        self.records.put(None)
+        self.thread.join()
+        try:
+            with self.db:
+                self.db.execute(
+                    "UPDATE runs SET finished = ?, hosts = ? WHERE id = ?",
+                    (time.time(), self.hosts, self.run))
+        except sqlite3.Error as e:
+            log.error(f"[history]: could not finish run {self.run}: {e}")
+        self.db.close()
+        log.write(f"[history]: stored {self.rows} rows as run {self.run}")
+
+
+def runs(db, limit: int) -> list:
+    """
+    Returns (id, started, finished, version, toml, hosts) of the
+    latest runs, newest first.
+    """
+    return db.execute(
+        "SELECT id, started, finished, version, toml, hosts FROM runs"
+        " ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+
+def host_history(db, ip: str, limit: int, status=None) -> list:
+    """
+    Returns (time, run, status, rtt, loss) of the latest results of
+    the host, newest first.
+    """
+    return db.execute(
+        "SELECT time, run, status, rtt, loss FROM hosts"
+        " WHERE ip = ? AND (? IS NULL OR status = ?)"
+        " ORDER BY time DESC LIMIT ?",
+        (ip, status, status, limit)).fetchall()
+
+
+def port_history(db, ip: str, port: int, limit: int, state=None) -> list:
+    """
+    Returns (time, run, state, http status, ttfb) of the latest results
+    of the port, newest first.
+    """
+    return db.execute(
+        "SELECT time, run, state, http, ttfb FROM ports"
+        " WHERE ip = ? AND port = ? AND (? IS NULL OR state = ?)"
+        " ORDER BY time DESC LIMIT ?",
+        (ip, port, state, state, limit)).fetchall()
+
+
+def latest_results(db, ip: str, before_run=None):
+    """
+    Returns the latest results of the host (stored before the run
+    `before_run`) as (run, status, rtt, loss, {port: (state, http
+    status, ttfb)}), or None if it was never stored.
+    """
+    row = db.execute("SELECT run, time, status, rtt, loss FROM hosts"
+                     " WHERE ip = ? AND (? IS NULL OR run < ?)"
+                     " ORDER BY time DESC LIMIT 1",
+                     (ip, before_run, before_run)).fetchone()
+    if row is None:
+        return None
+    (run, at, status, rtt, loss) = row
+    ports = {port: (state, http, ttfb) for (port, state, http, ttfb)
+             in db.execute("SELECT port, state, http, ttfb FROM ports"
+                           " WHERE run = ? AND ip = ? AND time = ?",
+                           (run, ip, at))}
+    return (run, status, rtt, loss, ports)
+
+
+def changes(previous, record) -> list:
+    """
+    Returns (change, port) of every change of a results.HostRecord since
+    its previous results (see latest_results()), change being one of: "up",
+    "down", "opened" or "closed". port is None for "up" and "down".
+    """
+    status = STATUSES.get(record.status, "awaiting")
+    if previous is None:
+        return [] if status == "awaiting" else [(status, None)]
+    (_, was, _, _, ports) = previous
+    found = []
+    if status != was and status != "awaiting":
+        found.append((status, None))
+    if record.ports is None:
+        return found
+    for port in record.ports.ports:
+        (state, _, _) = ports.get(port, (None, None, None))
+        is_open = record.ports.is_open(port)
+        if is_open and state != "open":
+            found.append(("opened", port))
+        elif not is_open and state == "open":
+            found.append(("closed", port))
+    return found
+
+
+def __latest(db, table: str, where: str, params: tuple, before=None):
+    """
+    Returns the time of the latest row matching `where`, walking the
+    (ip, ..., time) index backwards from `before`.
+    """
+    if before is not None:
+        where += " AND time < ?"
+        params += (before,)
+    row = db.execute(f"SELECT time FROM {table} WHERE {where}"
+                     " ORDER BY time DESC LIMIT 1", params).fetchone()
+    return None if row is None else row[0]
+
+
+def __earliest(db, table: str, where: str, params: tuple, after: float):
+    row = db.execute(f"SELECT time FROM {table} WHERE {where} AND time > ?"
+                     " ORDER BY time LIMIT 1", params + (after,)).fetchone()
+    return None if row is None else row[0]
+
+
+def last_down(db, ip: str, port=None):
+    """
+    Returns (went down, came back up) of the latest time that the
+    host (or the port of the host) went down, or None if it never
+    did. `came back up` is None if it is still down.
+
+    A port counts as down when it was closed, or when its host was.
+    Each step only reads a few rows around the change, from the end
+    of the (ip, port, time) and (ip, time) indexes.
+    """
+    if port is None:
+        def latest(status, before=None):
+            return __latest(db, "hosts", "ip = ? AND status = ?",
+                            (ip, status), before)
+
+        def earliest(status, after):
+            return __earliest(db, "hosts", "ip = ? AND status = ?",
+                              (ip, status), after)
+    else:
+        def latest(status, before=None):
+            if status == "up":
+                return __latest(db, "ports", "ip = ? AND port = ? AND state = ?",
+                                (ip, port, "open"), before)
+            times = (__latest(db, "ports", "ip = ? AND port = ? AND state = ?",
+                              (ip, port, "closed"), before),
+                     __latest(db, "hosts", "ip = ? AND status = ?",
+                              (ip, "down"), before))
+            times = [t for t in times if t is not None]
+            return max(times) if times else None
+
+        def earliest(status, after):
+            if status == "up":
+                return __earliest(db, "ports",
+                                  "ip = ? AND port = ? AND state = ?",
+                                  (ip, port, "open"), after)
+            times = (__earliest(db, "ports",
+                                "ip = ? AND port = ? AND state = ?",
+                                (ip, port, "closed"), after),
+                     __earliest(db, "hosts", "ip = ? AND status = ?",
+                                (ip, "down"), after))
+            times = [t for t in times if t is not None]
+            return min(times) if times else None
+
+    down = latest("down")
+    if down is None:
+        return None
+    # the first time it was down since it was last up (if ever).
+    up = latest("up", before=down)
+    down = earliest("down", 0 if up is None else up)
+    return (down, earliest("up", down))
+
+
+def __when(timestamp) -> str:
+    if timestamp is None:
+        return "-"
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def __colored(value: str) -> str:
+    if not sys.stdout.isatty():
+        return value
+    match value:
+        case "up" | "open":
+            return f"{ansi.GREEN}{value}{ansi.END}"
+        case "down" | "closed":
+            return f"{ansi.RED}{value}{ansi.END}"
+    return value
+
+
+def __number(value, unit="") -> str:
+    return "-" if value is None else f"{value:.2f}{unit}"
+
+
+def print_history(db, host=None, port=None, status=None,
+                  last_down_only=False, limit=20):
+    """
+    Prints the answer of `sat history` to STDOUT: the latest runs if
+    no host is given, otherwise the latest results of the host (or of
+    one of its ports), or when it last went down.
+    """
+    if host is None:
+        print(f"{'run':>6}  {'started':<19}  {'finished':<19}  "
+              f"{'hosts':>7}  toml")
+        for (run, started, finished, _, toml_file, hosts) in runs(db, limit):
+            print(f"{run:>6}  {__when(started):<19}  {__when(finished):<19}  "
+                  f"{'-' if hosts is None else hosts:>7}  {toml_file}")
+        return
+
+    target = host if port is None else f"{host}:{port}"
+    if last_down_only:
+        change = last_down(db, host, port)
+        if change is None:
+            print(f"{target} was never down")
+            return
+        (down, up) = change
+        if up is None:
+            print(f"{target} went down on {__when(down)}, and is still down")
+        else:
+            print(f"{target} went down on {__when(down)}, "
+                  f"and came back up on {__when(up)}")
+        return
+
+    if port is None:
+        rows = [(at, run, value, __number(rtt, "ms"), __number(loss))
+                for (at, run, value, rtt, loss)
+                in host_history(db, host, limit, status)]
+        header = ("status", "rtt", "loss")
+    else:
+        state = {"up": "open", "down": "closed"}.get(status, status)
+        rows = [(at, run, value, "-" if http is None else f"{http}",
+                 __number(ttfb, "ms"))
+                for (at, run, value, http, ttfb)
+                in port_history(db, host, port, limit, state)]
+        header = ("state", "http", "ttfb")
+
+    if not rows:
+        print(f"no results of {target}")
+        return
+    print(f"{target}\n{'time':<19}  {'run':>6}  {header[0]:<8}  "
+          f"{header[1]:>10}  {header[2]:>10}")
+    for (at, run, value, first, second) in rows:
+        # pad before coloring, the escape codes have no width.
+        print(f"{__when(at):<19}  {run:>6}  "
+              f"{__colored(value)}{' ' * (8 - value.__len__())}  "
+              f"{first:>10}  {second:>10}")
@@ -4,223 +4,338 @@ the program. Also contains the function used for the verbosity
 argument
 """
 
+import atexit
 import datetime
+import os
+import queue
+import threading
 import time
 import sys  # we could also use eprint from sat.modules.errors,
+from collections import deque
 
 # system import
 try:
     import sat.modules.ansi as ansi
-    import sat.modules.arguments as arguments
 except ModuleNotFoundError:
     import modules.ansi as ansi
-    import modules.arguments as arguments
 
 
-class __globals:
-    # use this as a global
-    args = arguments.parse("sat")
+# levels of the messages, from the least to the most important.
+INFO = 10
+NOTICE = 20
+OK = 30
+START = 40
+ERROR = 50
 
+LEVELS = {"info": INFO, "notice": NOTICE, "ok": OK, "error": ERROR}
 
-class NoColor:
-    log = {}
-    log_errors = {}
 
+class __globals:
+    # use this as a global, set by setup()
+    verbose = False
+    level = INFO
 
-class Color:
-    log = {}
-    log_errors = {}
 
+class records:
+    """
+    Every message is stored once, as a tuple of:
+    (id, unix time, level, the arguments of the message)
+    and is only formatted when it is printed or written out.
 
-class logging:
-    id = 0
-    error_id = 0
+    Only the most recent `capacity` records are kept in memory, errors
+    are also kept in a ring buffer of their own as (error id, record).
+    The whole log is only kept by streaming it to a file (see open_log).
+    """
+    capacity = 10000
+    entries = deque(maxlen=capacity)
+    errors = deque(maxlen=capacity)
+    count = 0
+    error_count = 0
+    lock = threading.Lock()
 
 
-def verbose_message(message: str):
+def set_capacity(capacity: int):
     """
-    prints the log in real time.
+    Changes the amount of records kept in memory.
     """
-    time.sleep(0.1)
-    # print to stderr
-    print(message, file=sys.stderr)
+    with records.lock:
+        records.capacity = capacity
+        records.entries = deque(records.entries, maxlen=capacity)
+        records.errors = deque(records.errors, maxlen=capacity)
 
 
-def error(*args):
+class logfile:
     """
-    Write an error message to the log, and to an
-    errors section within the log file.
+    The file that the log is streamed to. When the file grows past
+    max_bytes (if set), it is rotated: {path}.1 ... {path}.{backups}
+
+    written: the id of the last record that open_log() wrote, the
+    records up to it are already in the file.
+    """
+    path = None
+    file = None
+    written = 0
+    size = 0
+    max_bytes = 0
+    backups = 3
+    lock = threading.Lock()
+
+
+# (uncolored, colored) formats of each level.
+FORMATS = {
+    INFO: ("{info}(info) {message}",
+           f"{{info}}{ansi.LIGHT_BLUE}(info) {{message}}{ansi.END}"),
+    NOTICE: ("{info}[NOTICE]  {message}",
+             f"{{info}}{ansi.BOLD}{ansi.YELLOW}[NOTICE] {{message}}{ansi.END}"),
+    OK: ("{info}(OK){message}",
+         f"{{info}}{ansi.GREEN}(OK) {{message}}{ansi.END}"),
+    START: ("{info}(START):{message}",
+            f"{{info}}{ansi.BOLD}{ansi.BLUE}(START):{{message}}{ansi.END}"),
+    ERROR: ("{info}[ERROR]{message}",
+            f"{{info}}{ansi.RED}[ERROR]{ansi.END}: {{message}}"),
+}
+
+
+def format_record(record: tuple, colored=True, error_id=None) -> str:
     """
-    color = ansi.RED
-    weight = ansi.BOLD
+    Formats a record of the log, error_id is only
+    given in the errors section of the log.
+    """
+    (id, timestamp, level, args) = record
+    time = datetime.datetime.fromtimestamp(timestamp)
+    if error_id is None:
+        info = f"[id={id}::{time}]"
+    else:
+        info = f"[id={id};eid={error_id}::{time}]"
+    message = "".join(map(str, args))
+    return FORMATS.get(level)[colored].format(info=info, message=message)
 
-    time = datetime.datetime.now()
-    logging.id += 1
-    logging.error_id += 1
-    message = str()
-    for message_str in args:
-        message += message_str
 
-    # information
-    log_info = f"[id={logging.id}::{time}]"
-    log_type = "[ERROR]"
+def errors() -> list:
+    """
+    Returns the (error id, record) of the errors kept in memory.
+    """
+    with records.lock:
+        return list(records.errors)
 
-    # coloring
-    uncolored = f"{log_info}{log_type}{message}"
-    colored_message = f"{log_info}{color}{log_type}{ansi.END}: {message}"
 
-    # write to logs.
-    Color.log[logging.id] = colored_message
-    NoColor.log[logging.id] = uncolored
+def __rotate():
+    """
+    Shifts {path}.1 to {path}.2 and so on, moves the log to {path}.1,
+    and starts a new, empty log.
+    """
+    logfile.file.close()
+    for i in range(logfile.backups - 1, 0, -1):
+        if os.path.exists(f"{logfile.path}.{i}"):
+            os.replace(f"{logfile.path}.{i}", f"{logfile.path}.{i+1}")
+    os.replace(logfile.path, f"{logfile.path}.1")
+    logfile.file = open(logfile.path, "w")
+    logfile.size = 0
 
-    # verbose
-    if __globals.args.verbose:
-        verbose_message(colored_message)
 
-    # write to separate logs.
-    log_info = f"[id={logging.id};eid={logging.error_id}::{time}]"
-    uncolored = f"{log_info}{log_type}{message}"
-    colored_message = f"{log_info}{color}{log_type}{ansi.END}: {message}"
-    del message, time
-    Color.log_errors[(logging.error_id, logging.id)] = colored_message
-    NoColor.log_errors[(logging.error_id, logging.id)] = uncolored
+def __append(lines: list):
+    """
+    Appends lines to the log file, rotating it once it is full.
+    """
+    with logfile.lock:
+        if logfile.file is None:
+            return
+        text = "".join(f"{line}\n" for line in lines)
+        logfile.file.write(text)
+        logfile.size += text.__len__()
+        if logfile.max_bytes and logfile.size >= logfile.max_bytes:
+            __rotate()
 
 
-def start(*args):
-    time = datetime.datetime.now()
+class writer:
     """
-    Write a start message to the log
+    The verbose messages are written to STDERR, and the records are
+    streamed to the log file, by a single background thread, so that
+    the threads logging them never wait on STDERR or the disk.
     """
-    color = ansi.BLUE
-    logging.id += 1
-
-    message = str()
-    for message_str in args:
-        message += message_str
+    messages = queue.SimpleQueue()
+    thread = None
+    lock = threading.Lock()
+    # the most messages written with a single write()
+    batch_size = 256
 
-    # information
-    log_info = f"[id={logging.id}::{time}]"
-    log_type = "(START):"
 
-    # coloring
-    uncolored = f"{log_info}{log_type}{message}"
-    colored_message = f"{log_info}{ansi.BOLD}{
-        color}{log_type}{message}{ansi.END}"
+def __write_messages():
+    """
+    Waits for messages, and writes every message that is already
+    queued up at once, followed by a single flush.
+    """
+    while True:
+        batch = [writer.messages.get()]
+        while batch.__len__() < writer.batch_size:
+            try:
+                batch.append(writer.messages.get_nowait())
+            except queue.Empty:
+                break
+
+        flushed = [message for message in batch
+                   if isinstance(message, threading.Event)]
+        # records are queued up as tuples, and formatted here. In
+        # verbose mode, the records queued up before the file was opened
+        # were already written by open_log().
+        queued = [record for record in batch
+                  if isinstance(record, tuple)
+                  and record[0] > logfile.written]
+        if logfile.file is not None and queued:
+            __append([format_record(record, False) for record in queued])
+
+        if __globals.verbose:
+            lines = [format_record(message) if isinstance(message, tuple)
+                     else message for message in batch
+                     if not isinstance(message, threading.Event)]
+        else:
+            lines = [message for message in batch
+                     if isinstance(message, str)]
+        if lines:
+            sys.stderr.write("\n".join(lines) + "\n")
+            sys.stderr.flush()
+        if flushed and logfile.file is not None:
+            with logfile.lock:
+                logfile.file.flush()
+        for event in flushed:
+            event.set()
+
+
+def __start_writer():
+    with writer.lock:
+        if writer.thread is None:
+            writer.thread = threading.Thread(target=__write_messages,
+                                             name="sat-log-writer",
+                                             daemon=True)
+            writer.thread.start()
+            # messages still queued up when the program exits.
+            atexit.register(flush)
+
+
+def flush(timeout=5.0):
+    """
+    Waits until every queued message has been written.
+    """
+    if writer.thread is None:
+        return
+    done = threading.Event()
+    writer.messages.put(done)
+    done.wait(timeout)
 
-    # verbose
-    if __globals.args.verbose:
-        verbose_message(colored_message)
 
-    del message, time
-    # write to logs.
-    Color.log[logging.id] = colored_message
-    NoColor.log[logging.id] = uncolored
+def verbose_message(message):
+    """
+    prints the log in real time, from the writer thread.
+    message is either a string, or a record of the log.
+    """
+    if writer.thread is None:
+        __start_writer()
+    writer.messages.put(message)
 
 
-def notify(*args):
-    time = datetime.datetime.now()
+def __log(level: int, args: tuple):
     """
-    Write a notification based message to the log
+    Stores the message, messages below the level are dropped
+    before anything is done with them.
     """
-    color = ansi.YELLOW
-    logging.id += 1
+    if level < __globals.level:
+        return
+    with records.lock:
+        records.count += 1
+        record = (records.count, time.time(), level, args)
+        records.entries.append(record)
+        if level == ERROR:
+            records.error_count += 1
+            records.errors.append((records.error_count, record))
+        # decided under the lock, so that open_log() writes
+        # every record exactly once.
+        stream = logfile.file is not None
 
-    message = str()
-    for message_str in args:
-        message += message_str
-
-    # information
-    log_info = f"[id={logging.id}::{time}]"
-    log_type = "[NOTICE] "
+    # verbose
+    if __globals.verbose or stream:
+        verbose_message(record)
 
-    # coloring
-    uncolored = f"{log_info}{log_type} {message}"
-    colored_message = f"{log_info}{ansi.BOLD}{
-        color}{log_type}{message}{ansi.END}"
 
-    # verbose
-    if __globals.args.verbose:
-        verbose_message(colored_message)
+def error(*args):
+    """
+    Write an error message to the log, and to an
+    errors section within the log file.
 
-    del message, time
-    # write to logs.
-    Color.log[logging.id] = colored_message
-    NoColor.log[logging.id] = uncolored
+    The arguments of every message are joined together when the
+    log is formatted, so passing the values as separate arguments
+    rather than an f-string defers the formatting:
+        log.error("unable to connect to ", ip, ":", port)
+    """
+    __log(ERROR, args)
 
 
-def info(*args):
-    time = datetime.datetime.now()
+def start(*args):
     """
-    Write information on values to the log
+    Write a start message to the log
     """
-    color = ansi.LIGHT_BLUE
-
-    logging.id += 1
-    message = str()
-    for message_str in args:
-        message += message_str
+    __log(START, args)
 
-    # information
-    log_info = f"[id={logging.id}::{time}]"
-    log_type = "(info)"
 
-    # coloring
-    uncolored = f"{log_info}{log_type} {message}"
-    colored_message = f"{log_info}{color}{log_type} {message}{ansi.END}"
+def notify(*args):
+    """
+    Write a notification based message to the log
+    """
+    __log(NOTICE, args)
 
-    # verbose
-    if __globals.args.verbose:
-        verbose_message(colored_message)
 
-    del message, time
-    # write to logs.
-    Color.log[logging.id] = colored_message
-    NoColor.log[logging.id] = uncolored
+def info(*args):
+    """
+    Write information on values to the log
+    """
+    __log(INFO, args)
 
 
 def write(*args):
-    time = datetime.datetime.now()
     """
     Write a standard message to the log
     """
-    color = ansi.GREEN
-
-    logging.id += 1
-    message = str()
-    for message_str in args:
-        message += message_str
+    __log(OK, args)
 
-    # information
-    log_info = f"[id={logging.id}::{time}]"
-    log_type = "(OK)"
 
-    # coloring
-    uncolored = f"{log_info}{log_type}{message}"
-    colored_message = f"{log_info}{color}{log_type} {message}{ansi.END}"
-
-    # verbose
-    if __globals.args.verbose:
-        verbose_message(colored_message)
-
-    del message, time
-    # write to logs.
-    Color.log[logging.id] = colored_message
-    NoColor.log[logging.id] = uncolored
+def print_log():
+    # the errors are printed after the verbose messages.
+    flush()
+    # printed to STDERR along with the verbose messages, so that
+    # STDOUT only holds the results (see --format ndjson).
+    print("\n\nErrors that occurred:\n", file=sys.stderr)
+    for (error_id, record) in errors():
+        print(format_record(record, True, error_id), file=sys.stderr,
+              flush=True)
+
+
+def setup(verbose=False, level="info", history=10000,
+          out_file=None, max_bytes=0):
+    """
+    Configures the log, main.run() calls this with the arguments
+    of the user. Until then, every message is kept in memory.
 
+    verbose: print the messages to STDERR as they are logged.
+    level: the least important messages to keep (see LEVELS).
+    history: amount of records kept in memory.
+    out_file: stream the log to this file (see open_log).
+    max_bytes: rotate the log file once it grows past this size.
 
-def print_log():
-    print("\n\nErrors that occurred:\n")
-    for (error_id, id) in Color.log_errors.keys():
-        print(f"{Color.log_errors.get((error_id, id))}", flush=True)
-    if __globals.args.verbose:
-        time.sleep(1)
+    If the log is neither printed nor written out, only errors are kept.
+    """
+    __globals.verbose = verbose
+    if not verbose and out_file is None:
+        __globals.level = ERROR
+    else:
+        __globals.level = LEVELS.get(level, INFO)
+    set_capacity(history)
+    if out_file is not None:
+        open_log(out_file, max_bytes)
 
 
-def write_log(out_file=""):
+def get_log_path(out_file="") -> str:
     """
-    Write the log out to a file. Creates the logfile:
-    `sat-{CURRENT_UNIX_TIME_STAMP}.log`
-    will create in /tmp/directory.
+    Returns the path of the logfile:
+    `sat_{CURRENT_UTC_TIME}.log` if no name is given.
     """
     unix_timestamp = str(datetime.datetime.utcnow()).replace(" ", "_").replace(
         ":", "-")
@@ -229,22 +344,51 @@ def write_log(out_file=""):
     if out_file == "":
         out_file = f"sat_{unix_timestamp}"
     # format the unix_timestamp to fit naming convention.
+    return f"{out_file}.log"
+
+
+def open_log(out_file="", max_bytes=0):
+    """
+    Starts streaming the log to a file, as the records are logged.
+    The records that are already in memory are written first.
+    max_bytes: rotate the file once it grows past this size, 0 never.
+    """
+    path = get_log_path(out_file)
+    with records.lock:
+        with logfile.lock:
+            logfile.path = path
+            logfile.file = open(path, "w")
+            logfile.size = 0
+            logfile.max_bytes = max_bytes
+        history = list(records.entries)
+        logfile.written = records.count
+        # written before any record that is logged from now on.
+        __append([format_record(record, False) for record in history])
+    __start_writer()
+
+
+def write_log(out_file=""):
+    """
+    Finishes the log file, by appending the errors section. If the log
+    was not being streamed (see open_log), the records that are still
+    in memory are written out first.
+    """
+    if logfile.file is None:
+        open_log(out_file)
+    flush()
 
-    # set the userid so that root does not own the file.
-    with open(f"{out_file}.log", "w") as logfile:
-        # write out the main log.
-        for id in NoColor.log.keys():
-            logfile.write(f"{NoColor.log.get(id)}\n")
-        logfile.writelines("\n== Errors that occurred ==\n\n")
+    with logfile.lock:
+        logfile.file.write("\n== Errors that occurred ==\n\n")
         # write the errors.
-        for (error_id, id) in NoColor.log_errors.keys():
-            logfile.write(f"{NoColor.log_errors.get((error_id, id))}\n")
-    logfile.close()
-    print(f"logfile written to {out_file}.log")
+        for (error_id, record) in errors():
+            logfile.file.write(f"{format_record(record, False, error_id)}\n")
+        logfile.file.close()
+        logfile.file = None
+    print(f"logfile written to {logfile.path}", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    __globals.args.verbose = True
+    setup(verbose=True)
     write("hello", "world", "no")
     notify("[THIS IS A NOTIFICATION]", 'do something')
     error("this", "\nis an ", "error")
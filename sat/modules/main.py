@@ -5,9 +5,16 @@ any missing library modules, fatal errors, and mismatched python versions.
 """
 
 # python venv + standard modules
+import asyncio
+import itertools
+import math
 import os
-import time
+import signal
+import sqlite3
 import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # try importing a major depend
 # my modules
@@ -19,6 +26,15 @@ try:
     from . import errors
     from . import toml
     from . import arguments
+    from . import resolver
+    from . import results
+    from . import networks
+    from . import ndjson
+    from . import history
+    from . import scheduler
+    from . import probecache
+    from . import portranges
+    from . import diff
 except ImportError:
     raise errors.Main.ImportError
 except Exception as e:
@@ -37,10 +53,25 @@ class Output():
         message.
         """
         if not verbose:
-            tables.draw_table(initial, stderr)
+            tables.draw_table(connectivity.results, initial, stderr)
+
+    def live_table(stderr, verbose=False, fps=10.0, viewport="auto"):
+        """
+        Prints the table, and starts redrawing it from a render
+        thread as the results come in (see tables.RenderLoop).
+
+        if verbose, nothing is printed, and None is returned.
+        """
+        if verbose:
+            return None
+        tables.get_renderer(connectivity.results, stderr, viewport)
+        tables.draw_table(connectivity.results, True, stderr)
+        render_loop = tables.RenderLoop(connectivity.results, stderr, fps)
+        render_loop.start()
+        return render_loop
 
 
-def __check_values(args, server, ip, ports, scan) -> int:
+def __check_values(args, server, ip, ports, scan, http_ports) -> int:
     """
     returns a signal code telling the program how to handle the error
     0's means nothing is wrong.
@@ -56,6 +87,8 @@ def __check_values(args, server, ip, ports, scan) -> int:
         log.write(f"[Main]: IP address for {server} is valid.")
         ports = check.ports(ports, server)
         log.write(f"[Main]: port(s) for {server} is valid")
+        http_ports = check.ports(http_ports, server)
+        log.write(f"[Main]: http port(s) for {server} is valid")
         scan = check.scan(scan, server)
         log.write(f"[Main]: scan value for {server} is valid")
         SIGNAL = 0
@@ -77,19 +110,19 @@ def __check_values(args, server, ip, ports, scan) -> int:
         SIGNAL = 2
     except errors.ConnectivityDefinitions.Scan.IncorrectType:
         SIGNAL = 2
-    return (SIGNAL, ip, ports, scan)
+    return (SIGNAL, ip, ports, scan, http_ports)
 
 
-def __create_threads(args, servers: list, timeout: int) -> list:
+def __load_servers(args, servers: dict) -> list:
     """
-    This function creates our main threads.
-    It further deserializes the server data provided
-    by the toml parser, allowing our program to use
-    the data within to load our variables, and load
-    the threads.
+    Deserializes the server data provided by the toml parser,
+    checks the values, and returns a list of targets for either of
+    the scan engines. Every target is a dictionary with the keys:
+    ip, ports, scan, http_ports, network, and interval.
     """
     server_information = servers.get("servers").items()
-    threads = []
+    targets = []
+    check = errors.Check()
 
     # our data types
     for (server, data) in server_information:
@@ -97,8 +130,9 @@ def __create_threads(args, servers: list, timeout: int) -> list:
         ip = data.get("ip")
         ports = data.get("ports")
         scan = data.get("scan")
-        (signal, ip, ports, scan) = __check_values(
-            args, server, ip, ports, scan)
+        http_ports = data.get("http_ports")
+        (signal, ip, ports, scan, http_ports) = __check_values(
+            args, server, ip, ports, scan, http_ports)
 
         match signal:
             # check the return signals from __check_values()
@@ -109,55 +143,520 @@ def __create_threads(args, servers: list, timeout: int) -> list:
             case 2:
                 ports = None
                 scan = False
+                http_ports = None
 
-        # ========load the threads======= #
-        connectivity.connections[ip] = ["awaiting", None]
-
-        # Update the map tables
-        tables.UpdateTables(connectivity.open_ports,
-                            connectivity.closed_ports,
-                            connectivity.connections)
         try:
-            t = threading.Thread(
-                target=connectivity.test, args=(ip, ports, scan, timeout))
-            t.daemon = True
-            log.info(f"Loading thread {t} with values:ip={ip}, Ports={
-                     ports} scan={scan},timeout={timeout}")
-            # run the thread as a daemon so that we can catch SIGINT
-            threads.append(t)
-        except Exception:
-            raise errors.Threads.FailedToCreate
+            interval = check.interval(data.get("interval"), server)
+        except errors.ConnectivityDefinitions.Interval.IncorrectType:
+            log.error(f"{server} interval must be a number of seconds "
+                      f"above 0, using {args.interval}s")
+            interval = None
 
-    return threads
+        network = networks.is_network(ip)
+        connectivity.results.add_host(ip)
+        if network:
+            connectivity.results.set_network(ip, networks.size(ip))
+        targets.append({"ip": ip, "ports": ports, "scan": scan,
+                        "http_ports": http_ports, "network": network,
+                        "interval": interval or args.interval})
 
+    return targets
 
-def __join_threads(threads: list, timeout: int, args):
+
+def __resolve(targets: list, args) -> list:
+    """
+    Resolves the hostnames of every target at once, and drops the
+    targets that cannot be resolved, that resolve to an address that
+    another target already scans, or that are defined more than once.
+    Networks are left as is.
     """
-    connects the threads, with a timeout.
-    Default timeout is 18 seconds, however, can be changed with the -T
-    argument. e.g:
+    if args.dns_cache:
+        resolver.load(resolver.get_cache_path())
+    addresses = resolver.resolve_all(
+        [target.get("ip") for target in targets
+         if not target.get("network")], args.dns_ttl)
+    if args.dns_cache:
+        resolver.save(resolver.get_cache_path())
+
+    resolved = []
+    scanned_by = {}
+    seen = set()
+    for target in targets:
+        ip = target.get("ip")
+        if ip in seen:
+            # servers with the same ip share a single record, which
+            # the first of them scans.
+            log.notify(f"[Main]: {ip} is defined more than once")
+            continue
+        seen.add(ip)
+        if target.get("network"):
+            resolved.append(target)
+            continue
+        address = addresses.get(ip)
+        if address is None:
+            connectivity.results.set_status(ip, results.DOWN)
+            connectivity.results.mark_done(ip)
+            continue
+        if address in scanned_by:
+            log.notify(f"[Main]: {ip} resolves to {address}, which is "
+                       f"already scanned as {scanned_by.get(address)}")
+            connectivity.results.remove_host(ip)
+            continue
+        scanned_by[address] = ip
+        connectivity.addresses[ip] = address
+        resolved.append(target)
+    return resolved
+
+
+def __scan_deadline(targets: list, timeout: int, args) -> float:
+    """
+    Returns the time (in seconds) that the whole scan is allowed to take.
+    If the user didn't set one with --deadline, every round of workers
+    gets the same budget that used to be given to each thread:
 
-    (python sat -T 6 == timeout=22)
     ```
-    timeout = (timeout*2)+10
+    budget = (timeout*2)+10
     ```
+    """
+    if args.deadline > 0:
+        return args.deadline
+    workers = args.workers if args.engine == "threads" else args.concurrency
+    hosts = sum(networks.size(target.get("ip")) if target.get("network")
+                else 1 for target in targets)
+    rounds = math.ceil(hosts / workers)
+    return max(rounds, 1) * ((timeout*2)+10)
+
 
-    6 for ping, 6 for http, 12s total testing.
-    Before killing, 10 seconds to join.
+def __expire(targets: list, members=()):
+    """
+    Marks every target, and every member of a network that was being
+    scanned, that did not finish before the deadline as timed out.
+    Whatever their probes find afterwards is ignored.
+    """
+    hosts = [target.get("ip") for target in targets
+             if not target.get("network")]
+    for ip in itertools.chain(hosts, members):
+        if connectivity.results.is_done(ip):
+            continue
+        log.error(f"[Main]: {ip} did not finish before the deadline!")
+        if connectivity.results.status(ip) == results.AWAITING:
+            connectivity.results.set_status(ip, results.DOWN)
+        connectivity.results.mark_done(ip)
+    __finish_networks(targets)
+
+
+def __on_sweep(targets: list, alive: dict) -> list:
+    """
+    Marks the targets that did not respond to the ping sweep (or were
+    not pinged before the deadline), and returns the targets that are
+    left to scan.
+    """
+    log.write(f"[Main]: {list(alive.values()).count(True)}/{
+              alive.__len__()} addresses responded to the ping sweep")
+    for (ip, responsive) in alive.items():
+        if responsive is None:
+            log.error(f"[Main]: {ip} did not finish before the deadline!")
+        if not responsive:
+            connectivity.results.set_status(ip, results.DOWN)
+            connectivity.results.mark_done(ip)
+    return [target for target in targets if alive.get(target.get("ip"))]
+
+
+def __network_chunks(targets: list, args, deadline_at: float):
+    """
+    Yields (target, addresses) for chunks of the addresses of every
+    network target, until the deadline (a time.monotonic() value)
+    passes. Only a single chunk of addresses exists at a time.
+    """
+    for target in targets:
+        if not target.get("network"):
+            continue
+        for chunk in networks.chunks(target.get("ip"), args.concurrency):
+            if time.monotonic() > deadline_at:
+                log.error(f"[Main]: the sweep of {target.get("ip")} "
+                          "did not finish before the deadline!")
+                return
+            yield (target, chunk)
+
+
+def __on_network_sweep(target: dict, alive: dict, pings: dict) -> list:
     """
-    log.notify("[Main]: Joining threads...")
-    log.info(f"threads to join: {threads.__len__()}")
+    Adds the addresses of the network that responded to the ping
+    sweep to its record, along with their (rtt, loss) from `pings`,
+    and returns the targets of those that are left to scan. Addresses
+    that are down are never stored, and addresses that are already
+    scanned on their own (e.g: a server within the network) are not
+    scanned again.
+    """
+    network = target.get("ip")
+    members = []
+    # addresses that were not pinged before the deadline are None.
+    connectivity.results.add_swept(network, sum(
+        responsive is not None for responsive in alive.values()))
+    for (address, responsive) in alive.items():
+        if not responsive:
+            continue
+        (rtt, loss) = pings.get(address, (None, None))
+        if not connectivity.results.add_member(
+                network, address, rtt=rtt, loss=loss):
+            continue
+        if target.get("scan") and target.get("ports") is not None:
+            members.append({"ip": address,
+                            "ports": target.get("ports"),
+                            "scan": True,
+                            "http_ports": target.get("http_ports"),
+                            "network": False})
+        else:
+            # nothing left to scan.
+            connectivity.results.mark_done(address)
+    log.write(f"[Main]: {list(alive.values()).count(True)}/{
+              alive.__len__()} addresses of {network} responded")
+    return members
+
+
+def __finish_networks(targets: list):
+    """
+    A network is up if any of its addresses responded.
+    """
+    for target in targets:
+        ip = target.get("ip")
+        if (target.get("network")
+                and connectivity.results.status(ip) == results.AWAITING):
+            record = connectivity.results.get(ip)
+            connectivity.results.set_status(
+                ip, results.UP if record.members else results.DOWN)
+
+
+def __scan_threads(targets: list, timeout: int, args, pool=None):
+    """
+    Runs the targets on a fixed size pool of worker threads,
+    the size of the pool is set with --workers. A pool can be
+    passed in to be reused between scans (see __daemon).
+
+    The workers only write to the results store, they never draw
+    the table themselves. The RenderLoop (see Output.live_table) is
+    subscribed to the store, and redraws the rows that changed as
+    they come in, so one slow server does not hold back the rest
+    of the table.
+    """
+    deadline = __scan_deadline(targets, timeout, args)
+    deadline_at = time.monotonic() + deadline
+    if pool is None:
+        log.notify("[Main]: Starting worker pool...")
+    log.info(f"targets to scan: {targets.__len__()}, workers: {
+             args.workers}, deadline: {deadline}s")
+
+    hosts = [target for target in targets if not target.get("network")]
+    alive = connectivity.sweep([target.get("ip") for target in hosts],
+                               timeout, args.concurrency, deadline_at)
+    hosts = __on_sweep(hosts, alive)
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ThreadPoolExecutor(max_workers=args.workers,
+                                  thread_name_prefix="sat-worker")
+    futures = {}
+    members = []
+    # the workers of this scan return early once it is set, rather
+    # than holding the process (or the daemon's pool) past the deadline.
+    stop = threading.Event()
+
+    def submit(target: dict):
+        future = pool.submit(connectivity.test,
+                             target.get("ip"),
+                             target.get("ports"),
+                             target.get("scan"),
+                             timeout,
+                             True,
+                             target.get("http_ports"),
+                             stop)
+        futures[future] = target.get("ip")
+        future.add_done_callback(
+            lambda _: connectivity.results.mark_done(target.get("ip")))
+
+    try:
+        for target in hosts:
+            submit(target)
+
+        # networks are swept one chunk at a time, and only the addresses
+        # that are up are handed to the pool.
+        for (target, chunk) in __network_chunks(targets, args, deadline_at):
+            pings = {}
+            alive = connectivity.sweep(chunk, timeout, args.concurrency,
+                                       deadline_at, pings)
+            for member in __on_network_sweep(target, alive, pings):
+                members.append(member.get("ip"))
+                submit(member)
+        __finish_networks(targets)
+
+        remaining = max(deadline_at - time.monotonic(), 0)
+        for future in as_completed(futures, timeout=remaining):
+            log.write(f"[Main Thread]: {futures.get(future)} completed!")
+    except TimeoutError:
+        stop.set()
+        __expire(targets, members)
+    finally:
+        # don't start any targets that are still queued.
+        stop.set()
+        if own_pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        else:
+            for future in futures:
+                future.cancel()
+
+
+async def __scan_async(targets: list, timeout: int, args):
+    """
+    Runs every target as a task on a single event loop. A shared
+    semaphore caps the amount of probes in flight across all of
+    the targets. As with __scan_threads, the tasks only write to
+    the results store, and the RenderLoop redraws the table.
+    """
+    deadline = __scan_deadline(targets, timeout, args)
+    deadline_at = time.monotonic() + deadline
+    log.notify("[Main]: Starting asyncio engine...")
+    log.info(f"targets to scan: {targets.__len__()}, concurrency: {
+             args.concurrency}, deadline: {deadline}s")
+
+    limit = asyncio.Semaphore(args.concurrency)
+    hosts = [target for target in targets if not target.get("network")]
+    alive = await connectivity.async_sweep(
+        [target.get("ip") for target in hosts], timeout, limit, deadline_at)
+    hosts = __on_sweep(hosts, alive)
+
+    def create_task(target: dict) -> asyncio.Task:
+        task = asyncio.create_task(
+            connectivity.async_test(target.get("ip"),
+                                    target.get("ports"),
+                                    target.get("scan"),
+                                    timeout,
+                                    limit,
+                                    True,
+                                    target.get("http_ports")))
+        task.add_done_callback(
+            lambda _: connectivity.results.mark_done(target.get("ip")))
+        return task
+
+    tasks = [create_task(target) for target in hosts]
+    members = []
+
+    # networks are swept one chunk at a time, and only the addresses
+    # that are up are scanned.
+    for (target, chunk) in __network_chunks(targets, args, deadline_at):
+        pings = {}
+        alive = await connectivity.async_sweep(chunk, timeout, limit,
+                                               deadline_at, pings)
+        for member in __on_network_sweep(target, alive, pings):
+            members.append(member.get("ip"))
+            tasks.append(create_task(member))
+    __finish_networks(targets)
 
-    timeout += 1
-    for thread in threads:
-        thread.join(timeout)
-        tables.UpdateTables(connectivity.open_ports,
-                            connectivity.closed_ports,
-                            connectivity.connections)
-        log.write(f"[Main Thread]: {thread} joined!")
-        log.info(f"[Updated Connections]:{tables.UpdateTables.connections}")
-        # draw table
-        Output.table(args.stderr, args.verbose, initial=False)
+    try:
+        remaining = max(deadline_at - time.monotonic(), 0)
+        for task in asyncio.as_completed(tasks, timeout=remaining):
+            await task
+    except TimeoutError:
+        # asyncio.run() cancels the remaining tasks for us.
+        __expire(targets, members)
+
+
+def __incremental(targets: list, args, store) -> tuple:
+    """
+    Picks the targets to scan with --incremental, from the latest
+    results of each target in the --store database. Targets that were
+    not up (or never stored), whose ports changed, or that are networks
+    are always scanned. Of the targets that were up, each run only
+    scans those whose turn it is, so that every one of them is scanned
+    at least once every `args.incremental` runs.
+
+    The rest keep their previous results, which are copied into the
+    run of the --store database as they are.
+    Returns (targets to scan, {ip: previous results}).
+    """
+    db = history.connect(store.path)
+    previous = {}
+    scanned = []
+    for target in targets:
+        ip = target.get("ip")
+        if target.get("network"):
+            scanned.append(target)
+            continue
+        results_of = history.latest_results(db, ip, store.run)
+        previous[ip] = results_of
+        if results_of is None or results_of[1] != "up":
+            scanned.append(target)
+            continue
+
+        (_, _, rtt, loss, ports) = results_of
+        wanted = target.get("ports") if target.get("scan") else None
+        if ((wanted is not None or ports)
+                and wanted != portranges.PortRanges.from_ports(ports)):
+            scanned.append(target)
+            continue
+        if zlib.crc32(ip.encode()) % args.incremental == (
+                store.run % args.incremental):
+            scanned.append(target)
+            continue
+
+        # carried over from the previous results.
+        store.carry(ip, results_of[0])
+        connectivity.results.set_status(ip, results.UP)
+        connectivity.results.record_ping(ip, rtt, loss)
+        if wanted is not None:
+            connectivity.results.set_ports(ip, wanted)
+        for (port, (state, http, ttfb)) in ports.items():
+            if state == "open":
+                connectivity.results.mark_open(ip, port)
+            if http is not None:
+                connectivity.results.record_http(ip, port, http, ttfb)
+        connectivity.results.mark_done(ip)
+    db.close()
+    log.notify(f"[Main]: incremental scan of {scanned.__len__()}/"
+               f"{targets.__len__()} targets")
+    return (scanned, previous)
+
+
+def __print_changes(targets: list, previous: dict):
+    """
+    Prints the changes of the scanned targets since their previous
+    results (see history.changes()) to STDERR.
+    """
+    found = []
+    for target in targets:
+        ip = target.get("ip")
+        if ip not in previous:
+            continue
+        record = connectivity.results.get(ip)
+        for (change, port) in history.changes(previous.get(ip), record):
+            where = ip if port is None else f"{ip}:{port}"
+            log.notify(f"[Main]: {where} {change}")
+            found.append(f"  {where:<30} {change}")
+    eprint(f"{found.__len__()} changes since the previous results, "
+           f"{targets.__len__()} targets scanned:")
+    if found:
+        eprint("\n".join(found))
+
+
+def __scan(targets: list, timeout: int, args, pool=None):
+    """
+    Scans the targets once, with the engine set with --engine.
+    """
+    match args.engine:
+        case "asyncio":
+            asyncio.run(__scan_async(targets, timeout, args))
+        case _:
+            __scan_threads(targets, timeout, args, pool)
+    # networks are only done once every member is.
+    for target in targets:
+        connectivity.results.mark_done(target.get("ip"))
+    probecache.save(args.cache_size)
+
+
+def __daemon(targets: list, timeout: int, args):
+    """
+    Keeps scanning every target on its own interval (the `interval`
+    key of the server, or --interval), until interrupted. Targets that
+    are due at about the same time are scanned together, and the worker
+    threads are kept around between the scans.
+    """
+    timers = scheduler.Scheduler(jitter=args.jitter)
+    for target in targets:
+        timers.add(target, target.get("interval"))
+    # finish the scan that is running on SIGTERM, rather than dying.
+    signal.signal(signal.SIGTERM, lambda *_: timers.stop())
+
+    pool = None
+    if args.engine == "threads":
+        pool = ThreadPoolExecutor(max_workers=args.workers,
+                                  thread_name_prefix="sat-worker")
+    log.notify(f"[Main]: monitoring {targets.__len__()} targets...")
+    scans = 0
+    try:
+        while batch := timers.due():
+            started = time.monotonic()
+            due = [target for (target, _) in batch]
+            if scans > 0:
+                for target in due:
+                    connectivity.results.reset(target.get("ip"))
+            log.write(f"[Main]: scanning {due.__len__()} due targets")
+            __scan(due, timeout, args, pool)
+            timers.reschedule(batch, started)
+            scans += 1
+    except KeyboardInterrupt:
+        # stopping the daemon is how it is meant to end, the final
+        # table and the log are still written out.
+        log.notify("[Main]: interrupted")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    log.notify(f"[Main]: stopped monitoring after {scans} scans")
+
+
+def __history(name: str):
+    """
+    Runs the `history` subcommand, which reads back the
+    results that were kept with --store.
+    """
+    args = arguments.parse_history(name)
+    path = args.store or history.get_store_path()
+    if args.port is not None and args.host is None:
+        eprint("--port needs a host!")
+        exit(1)
+    if args.limit < 1:
+        eprint("The limit must be at least 1!")
+        exit(1)
+    try:
+        db = history.connect(path, create=False)
+    except FileNotFoundError:
+        eprint(f"{path} does not exist! Keep the results of a scan with --store")
+        exit(1)
+    except sqlite3.Error as e:
+        eprint(f"{path} can't be read: {e}")
+        exit(1)
+    with db:
+        history.print_history(db, args.host, args.port, args.status,
+                              args.last_down, args.limit)
+    db.close()
+
+
+def __diff(name: str):
+    """
+    Runs the `diff` subcommand, which prints what changed
+    between the results of two scans.
+    """
+    args = arguments.parse_diff(name)
+    if args.store is None:
+        if args.old is None or args.new is None:
+            eprint("diff needs two files written with --format ndjson, "
+                   "or --store!")
+            exit(1)
+        try:
+            (old, new) = (diff.read_ndjson(args.old), diff.read_ndjson(args.new))
+        except (OSError, ValueError) as e:
+            eprint(f"{e}")
+            exit(1)
+        diff.print_changes(diff.changes(old, new), args.format)
+        return
+
+    path = args.store or history.get_store_path()
+    try:
+        db = history.connect(path, create=False)
+        runs = [args.old, args.new]
+        if args.old is None or args.new is None:
+            latest = [run for (run, *_) in history.runs(db, 2)]
+            runs = [args.old or latest[-1], args.new or latest[0]]
+        runs = [int(run) for run in runs]
+        (old, new) = (diff.read_run(db, runs[0]), diff.read_run(db, runs[1]))
+    except FileNotFoundError:
+        eprint(f"{path} does not exist! Keep the results of a scan with --store")
+        exit(1)
+    except (sqlite3.Error, ValueError, IndexError) as e:
+        eprint(f"{path} has no runs to compare: {e}")
+        exit(1)
+    db.close()
+    if args.format == "table":
+        print(f"run {runs[0]} -> run {runs[1]}")
+    diff.print_changes(diff.changes(old, new), args.format)
 
 
 def run(name: str, version: str):
@@ -168,12 +667,28 @@ def run(name: str, version: str):
     """
     # initialize our arguments and load arguments
     date = time.asctime()
+    match arguments.subcommand():
+        case "history":
+            __history(name)
+            exit(0)
+        case "diff":
+            __diff(name)
+            exit(0)
     args = arguments.parse(name)
 
     # exit if these arguments to reduce unnecessary memory usage
     if args.version:
         print(f"{name} ver. {version}")
         exit(0)
+    if args.log_history < 1 or args.log_rotate < 0:
+        eprint("The log history must be at least 1, and the rotation size positive!")
+        exit(1)
+    # the log is streamed to the file while the scan runs.
+    log.setup(verbose=args.verbose,
+              level=args.log_level,
+              history=args.log_history,
+              out_file=args.output_log[0] if args.output_log else None,
+              max_bytes=int(args.log_rotate * 1024 * 1024))
     # moved this down here so that when -vV, it doesn't appear
     log.start(f"{name} ver. {version} on {date}")
 
@@ -206,27 +721,92 @@ def run(name: str, version: str):
         eprint(f"{servers_tomlfile} doesn't look like a toml file...")
         exit(1)
 
+    # import requests and icmplib, only once we are going to scan.
+    connectivity.load_dependencies()
+
+    if args.concurrency < 1 or args.workers < 1:
+        eprint("Concurrency and workers must be at least 1!")
+        exit(1)
+    if args.fps <= 0:
+        eprint("The frame rate must be above 0!")
+        exit(1)
+    if args.interval <= 0 or not 0 <= args.jitter < 1:
+        eprint("The interval must be above 0, and the jitter within [0, 1)!")
+        exit(1)
+    if args.cache_size < 1:
+        eprint("The cache size must be at least 1!")
+        exit(1)
+    if args.min_timeout <= 0:
+        eprint("The minimum timeout must be above 0!")
+        exit(1)
+    if args.incremental < 0 or (args.incremental and args.daemon):
+        eprint("--incremental must be at least 1 run, "
+               "and can't be used with --daemon!")
+        exit(1)
+    # --incremental reads the previous results from the --store database.
+    if args.incremental and args.store is None:
+        args.store = ""
+    # recent results of any run of sat are reused, rather than probed.
+    if args.max_age > 0:
+        probecache.load(probecache.get_cache_path(), args.max_age)
+    # connect timeouts follow the round trip time of every server.
+    if args.adaptive_timeout:
+        connectivity.adaptive_timeouts(min(args.min_timeout, timeout))
+
+    # the results are either streamed as NDJSON, or drawn as a table.
+    stream = None
+    if args.format == "ndjson":
+        stream = ndjson.Writer(connectivity.results, args.per_port)
+        stream.start()
+
+    # the results are also kept in the database, with --store.
+    store = None
+    if args.store is not None:
+        path = args.store or history.get_store_path()
+        try:
+            store = history.Writer(connectivity.results, path, version,
+                                   servers_tomlfile)
+        except sqlite3.Error as e:
+            eprint(f"{path} can't be opened: {e}")
+            exit(1)
+        store.start()
+
     # add messages to the log, and print the table
     # get the servers information from the toml file and parse it
-    threads: list = __create_threads(args, servers, timeout)
-    if not args.verbose:
-        Output.table(args.stderr)
+    targets: list = __load_servers(args, servers)
+    targets = __resolve(targets, args)
+    previous = None
+    if args.incremental:
+        (targets, previous) = __incremental(targets, args, store)
+    render_loop = None
+    if stream is None:
+        render_loop = Output.live_table(args.stderr, args.verbose, args.fps,
+                                        args.viewport)
 
     log.write(f"TOML {servers_tomlfile} loaded!")
 
-    # Start the threads
-    for thread in threads:
-        log.start(f"{thread}")
-        thread.start()
-
-    # Join the threads.
-    __join_threads(threads, timeout, args)
+    try:
+        if args.daemon:
+            __daemon(targets, timeout, args)
+        else:
+            __scan(targets, timeout, args)
+    finally:
+        # draws the final table in full.
+        if render_loop is not None:
+            render_loop.stop()
+        if stream is not None:
+            stream.stop()
+        if store is not None:
+            store.stop()
     log.write("[Completed Scan]")
 
     del servers_tomlfile, servers
 
     if args.verbose:
         log.print_log()
-        Output.table(args.stderr, verbose=False, initial=True)
+        if stream is None:
+            Output.table(args.stderr, verbose=False, initial=True)
+    if previous is not None:
+        __print_changes(targets, previous)
     if args.output_log:
         log.write_log(args.output_log[0])
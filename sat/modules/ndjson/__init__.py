@@ -0,0 +1,144 @@
+"""
+Streams the results as newline delimited JSON (--format ndjson), for
+when the output is read by another program rather than by a person.
+
+A line is written for every server as soon as it is done:
+```json
+{"ip": "127.0.0.1", "status": "up", "open_ports": [8080], "closed_ports": [22], ...}
+```
+Members of a network get a line of their own (with the network in
+`"network"`), followed by a line for the whole network once the scan
+ends. With --per-port, a line is also written for every scanned port.
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+try:
+    import sat.modules.log as log
+    from sat.modules.results import AWAITING, UP, DOWN
+except ModuleNotFoundError:
+    import modules.log as log
+    from modules.results import AWAITING, UP, DOWN
+
+STATUSES = {AWAITING: "awaiting", UP: "up", DOWN: "down"}
+
+
+def __http(record, port: int):
+    if record.http is None or port not in record.http:
+        return None
+    (status, ttfb) = record.http.get(port)
+    return {"status": status, "ttfb_ms": round(ttfb, 3)}
+
+
+def host_record(record, network=None, done_at=None) -> dict:
+    """
+    Returns the JSON object of a results.HostRecord.
+    """
+    line = {"ip": record.ip,
+            "status": STATUSES.get(record.status, "awaiting"),
+            "time": done_at}
+    if record.is_network():
+        open_ports = set()
+        for member in record.members.values():
+            open_ports.update(member.open_ports())
+        line.update({"size": record.size,
+                     "up": record.members.__len__(),
+                     "unscanned": record.size - record.swept,
+                     "open_ports": sorted(open_ports)})
+        return line
+
+    open_ports = record.open_ports()
+    line.update({"network": network,
+                 "open_ports": open_ports,
+                 "closed_ports": record.closed_ports(),
+                 "http": {port: http for port in open_ports
+                          if (http := __http(record, port)) is not None},
+                 "rtt_ms": record.rtt,
+                 "loss": record.loss})
+    return line
+
+
+def port_records(record, network=None, done_at=None) -> list:
+    """
+    Returns a JSON object for every scanned port of the record.
+    """
+    if record.ports is None:
+        return []
+    lines = []
+    for port in record.ports.ports:
+        state = "open" if record.ports.is_open(port) else "closed"
+        lines.append({"ip": record.ip, "network": network, "port": port,
+                      "state": state, "http": __http(record, port),
+                      "time": done_at})
+    return lines
+
+
+class Writer:
+    """
+    Subscribes to the hosts that are done in a results.ScanResults
+    store, and writes their lines to STDOUT from a thread of its own.
+    The threads that finish a host only queue up its record, every
+    record that is queued up is encoded and written at once, followed
+    by a single flush.
+    """
+
+    def __init__(self, results, per_port=False):
+        self.per_port = per_port
+        self.records = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.__write,
+                                       name="sat-ndjson", daemon=True)
+        results.subscribe_done(self.__done)
+
+    def __done(self, record, network):
+        self.records.put((record, network, round(time.time(), 3)))
+
+    def __lines(self, record, network, done_at) -> list:
+        lines = [host_record(record, network, done_at)]
+        if self.per_port:
+            lines.extend(port_records(record, network, done_at))
+        return lines
+
+    def __write(self):
+        while True:
+            batch = [self.records.get()]
+            while True:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopped = None in batch
+            output = []
+            for item in batch:
+                if item is None:
+                    continue
+                for line in self.__lines(*item):
+                    output.append(json.dumps(line, separators=(",", ":")))
+            if output:
+                self.__output("\n".join(output) + "\n")
+            if stopped:
+                return
+
+    def __output(self, text: str):
+        try:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # the reader went away (e.g: `| head`), the rest of the
+            # results are discarded, rather than failing on exit.
+            log.error("[ndjson]: STDOUT was closed by the reader")
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """
+        Writes the records that are still queued up, and stops.
+        """
+        self.records.put(None)
+        self.thread.join()
@@ -0,0 +1,70 @@
+"""
+Handles servers whose `ip` is a whole network rather than a single
+host, written either in CIDR notation or as a range of addresses:
+```toml
+    ip = "10.20.0.0/16"
+    ip = "10.0.0.1-10.0.0.254"
+```
+The addresses of a network are never stored, they are produced one
+at a time by the expand() generator.
+"""
+import ipaddress
+from itertools import islice
+
+
+def parse(ip: str):
+    """
+    Returns the first and last address of the network as integers,
+    or None if the value is not a network.
+    """
+    if not isinstance(ip, str):
+        return None
+    try:
+        if "/" in ip:
+            network = ipaddress.ip_network(ip.strip(), strict=False)
+            if network.num_addresses <= 2:
+                return (int(network[0]), int(network[-1]), network.version)
+            # skip the network and broadcast addresses (see .hosts())
+            return (int(network[1]), int(network[-2]), network.version)
+
+        if "-" in ip:
+            (first, last) = (ipaddress.ip_address(address.strip())
+                             for address in ip.split("-", 1))
+            if first.version != last.version or first > last:
+                return None
+            return (int(first), int(last), first.version)
+
+    except ValueError:
+        return None
+    return None
+
+
+def is_network(ip: str) -> bool:
+    return parse(ip) is not None
+
+
+def size(ip: str) -> int:
+    """
+    Returns the amount of addresses within the network.
+    """
+    (first, last, _) = parse(ip)
+    return last - first + 1
+
+
+def expand(ip: str):
+    """
+    Yields every address of the network as a string.
+    """
+    (first, last, version) = parse(ip)
+    address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    for i in range(first, last + 1):
+        yield str(address(i))
+
+
+def chunks(ip: str, chunk_size: int):
+    """
+    Yields lists of at most chunk_size addresses of the network.
+    """
+    addresses = expand(ip)
+    while chunk := list(islice(addresses, chunk_size)):
+        yield chunk
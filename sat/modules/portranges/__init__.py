@@ -0,0 +1,190 @@
+"""
+Parses the `ports` (and `http_ports`) values of a server into compact
+ranges of ports, rather than a list holding every single port.
+
+Besides integers, the following strings are accepted, either on their
+own or inside of a list:
+```toml
+    ports = "8000-8100"             # a range of ports
+    ports = "top-100"               # the most common TCP ports
+    ports = ["web", "ssh", 3306]    # named groups of ports (see GROUPS)
+```
+The ports are only expanded once iterated over, by a generator.
+"""
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+MIN_PORT = 1
+MAX_PORT = 65535
+
+# named groups of ports
+GROUPS = {
+    "web": (80, 443, 8000, 8008, 8080, 8443),
+    "ssh": (22,),
+    "mail": (25, 110, 143, 465, 587, 993, 995),
+    "dns": (53,),
+    "databases": (1433, 1521, 3306, 5432, 6379, 9200, 27017),
+    "remote": (22, 23, 3389, 5900),
+}
+
+# the most commonly open TCP ports, as listed by nmap's port frequencies.
+TOP_PORTS = {
+    10: (21, 22, 23, 25, 80, 110, 139, 443, 445, 3389),
+    20: (21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 443, 445, 993,
+         995, 1723, 3306, 3389, 5900, 8080),
+    100: (7, 9, 13, 21, 22, 23, 25, 26, 37, 53, 79, 80, 81, 88, 106, 110,
+          111, 113, 119, 135, 139, 143, 144, 179, 199, 389, 427, 443, 444,
+          445, 465, 513, 514, 515, 543, 544, 548, 554, 587, 631, 646, 873,
+          990, 993, 995, 1025, 1026, 1027, 1028, 1029, 1110, 1433, 1720,
+          1723, 1755, 1900, 2000, 2001, 2049, 2121, 2717, 3000, 3128, 3306,
+          3389, 3986, 4899, 5000, 5009, 5051, 5060, 5101, 5190, 5357, 5432,
+          5631, 5666, 5800, 5900, 6000, 6001, 6646, 7070, 8000, 8008, 8009,
+          8080, 8081, 8443, 8888, 9100, 9999, 10000, 32768, 49152, 49153,
+          49154, 49155, 49156, 49157),
+}
+
+
+class PortRanges:
+    """
+    A sorted set of ports, stored as non-overlapping (start, end)
+    ranges. Iterating over it yields every port in order.
+    """
+    __slots__ = ("starts", "ends", "offsets")
+
+    def __init__(self, ranges=()):
+        merged = []
+        for (start, end) in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self.starts = array("H", (start for (start, _) in merged))
+        self.ends = array("H", (end for (_, end) in merged))
+        # offsets[i] is the amount of ports before the i'th range.
+        self.offsets = array("L", accumulate(
+            (end - start + 1 for (start, end) in merged), initial=0))
+
+    @classmethod
+    def from_ports(cls, ports):
+        return cls((port, port) for port in ports)
+
+    def __iter__(self):
+        for (start, end) in zip(self.starts, self.ends):
+            yield from range(start, end + 1)
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __bool__(self):
+        return self.starts.__len__() > 0
+
+    def __range_of(self, port: int) -> int:
+        i = bisect_right(self.starts, port) - 1
+        if i >= 0 and port <= self.ends[i]:
+            return i
+        return -1
+
+    def __contains__(self, port):
+        return isinstance(port, int) and self.__range_of(port) >= 0
+
+    def __eq__(self, other):
+        return (isinstance(other, PortRanges)
+                and self.starts == other.starts and self.ends == other.ends)
+
+    def index(self, port: int) -> int:
+        """
+        Returns the position of the port when iterated over,
+        or -1 if the port is not in the ranges.
+        """
+        i = self.__range_of(port)
+        if i < 0:
+            return -1
+        return self.offsets[i] + port - self.starts[i]
+
+    def ranges(self):
+        return zip(self.starts, self.ends)
+
+    def __str__(self):
+        return format_ports(self)
+
+    def __repr__(self):
+        return f"PortRanges({format_ports(self)})"
+
+
+def format_ports(ports) -> str:
+    """
+    Formats sorted ports as a list with consecutive ports collapsed,
+    e.g: [22, 8000-8100]
+    """
+    if not isinstance(ports, PortRanges):
+        ports = PortRanges.from_ports(ports)
+    return "[" + ", ".join(
+        f"{start}" if start == end else f"{start}-{end}"
+        for (start, end) in ports.ranges()) + "]"
+
+
+def __parse_string(value: str) -> tuple:
+    """
+    Returns the (start, end) ranges of a string value. Raises a
+    KeyError if the name is unknown, and a ValueError if the value
+    isn't a valid range.
+    """
+    value = value.strip().lower()
+    if value in GROUPS:
+        return tuple((port, port) for port in GROUPS.get(value))
+
+    if value.startswith("top-"):
+        count = int(value.removeprefix("top-"))
+        if count not in TOP_PORTS:
+            raise KeyError(value)
+        return tuple((port, port) for port in TOP_PORTS.get(count))
+
+    if "-" in value:
+        (start, end) = value.split("-", 1)
+        (start, end) = (int(start), int(end))
+        if start > end:
+            raise ValueError(value)
+        return ((start, end),)
+
+    port = int(value)
+    return ((port, port),)
+
+
+def parse(value) -> PortRanges:
+    """
+    Parses an int, a string, or a list of either into PortRanges.
+
+    Raises a TypeError on values of the wrong type or unknown names,
+    and a ValueError if any port is outside of range(1, 65535).
+    """
+    match value:
+        case bool():
+            raise TypeError(value)
+        case int() | str():
+            values = [value]
+        case list():
+            values = value
+        case _:
+            raise TypeError(value)
+
+    ranges = []
+    for item in values:
+        match item:
+            case bool():
+                raise TypeError(item)
+            case int():
+                ranges.append((item, item))
+            case str():
+                try:
+                    ranges.extend(__parse_string(item))
+                except (KeyError, ValueError):
+                    raise TypeError(item)
+            case _:
+                raise TypeError(item)
+
+    if not all(MIN_PORT <= start and end <= MAX_PORT
+               for (start, end) in ranges):
+        raise ValueError(value)
+    return PortRanges(ranges)
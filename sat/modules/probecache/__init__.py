@@ -0,0 +1,192 @@
+"""
+Keeps the result of every probe on disk (--max-age), so that runs of
+sat that follow each other closely (a cron job, or several people
+scanning the same servers) only probe what was not recently checked.
+
+Results are keyed by (address, port, probe), and are served for as
+long as they are younger than --max-age:
+```py
+    probecache.cache.entries = {
+        # (result, rtt or ttfb in ms, packet loss, unix time checked)
+        ("127.0.0.1", 0, "ping"): ("up", 0.2, 0.0, 1700000000.0),
+        ("127.0.0.1", 22, "tcp"): ("closed", None, None, 1700000000.0),
+        ("127.0.0.1", 80, "http"): ("200", 1.3, None, 1700000000.0),
+    }
+```
+The cache is a SQLite database in WAL mode, so that any amount of sat
+processes can read and write it at once. Only the fresh entries are
+read when the scan starts, and every new result is written within a
+single transaction once it ends. The least recently used entries are
+evicted past --cache-size entries.
+"""
+import os
+import sqlite3
+import threading
+import time
+try:
+    import sat.modules.log as log
+    import sat.modules.toml as toml
+except ModuleNotFoundError:
+    import modules.log as log
+    import modules.toml as toml
+
+# probe types
+PING = "ping"
+TCP = "tcp"
+HTTP = "http"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    address TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    probe TEXT NOT NULL,
+    result TEXT NOT NULL,
+    a REAL,
+    b REAL,
+    checked REAL NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (address, port, probe)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS probes_by_use ON probes (used);
+"""
+
+
+class cache:
+    """
+    (address, port, probe)->(result, a, b, unix time checked)
+
+    pending: the rows of the probes of this run, not yet written.
+    used: the keys of the entries that were served during this run.
+    """
+    enabled = False
+    path = None
+    max_age = 0.0
+    entries = {}
+    pending = []
+    used = set()
+    lock = threading.Lock()
+
+
+def get_cache_path() -> str:
+    """
+    The on-disk cache lives next to the default servers.toml
+    """
+    return os.path.join(os.path.dirname(toml.get_toml_path()),
+                        "probe_cache.db")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=10)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+def load(path: str, max_age: float):
+    """
+    Turns the cache on, and loads the entries that are younger than
+    max_age (in seconds).
+    """
+    try:
+        db = connect(path)
+        rows = db.execute(
+            "SELECT address, port, probe, result, a, b, checked FROM probes"
+            " WHERE checked >= ?", (time.time() - max_age,)).fetchall()
+        db.close()
+    except sqlite3.Error as e:
+        log.error(f"[cache]: not using the probe cache {path}: {e}")
+        return
+
+    with cache.lock:
+        cache.enabled = True
+        cache.path = path
+        cache.max_age = max_age
+        for (address, port, probe, result, a, b, checked) in rows:
+            cache.entries[(address, port, probe)] = (result, a, b, checked)
+    log.info(f"[cache]: loaded {rows.__len__()} fresh probes")
+
+
+def lookup(address: str, port: int, probe: str):
+    """
+    Returns (result, a, b, checked) of a fresh entry, or None.
+    """
+    if not cache.enabled:
+        return None
+    key = (address, port, probe)
+    entry = cache.entries.get(key)
+    if entry is None or entry[3] < time.time() - cache.max_age:
+        return None
+    cache.used.add(key)
+    return entry
+
+
+def split(address: str, ports, probe=TCP) -> tuple:
+    """
+    Returns ({port: (result, a, b, checked)}, [ports]) of the ports with
+    a fresh entry, and of the ports that are left to probe.
+    """
+    if not cache.enabled:
+        return ({}, ports)
+    cached = {}
+    stale = []
+    for port in ports:
+        entry = lookup(address, port, probe)
+        if entry is None:
+            stale.append(port)
+        else:
+            cached[port] = entry
+    return (cached, stale)
+
+
+def put(address: str, port: int, probe: str, result: str, a=None, b=None):
+    """
+    Stores the result of a probe, it is written out by save().
+    """
+    if not cache.enabled:
+        return
+    checked = time.time()
+    with cache.lock:
+        cache.entries[(address, port, probe)] = (result, a, b, checked)
+        cache.pending.append((address, port, probe, result, a, b, checked))
+
+
+def save(max_entries=100000):
+    """
+    Writes the probes of this run, and evicts the least recently used
+    entries past max_entries, all within a single transaction.
+    """
+    if not cache.enabled:
+        return
+    now = time.time()
+    with cache.lock:
+        (pending, cache.pending) = (cache.pending, [])
+        (used, cache.used) = (cache.used, set())
+
+    try:
+        db = connect(cache.path)
+        with db:
+            db.executemany(
+                "INSERT INTO probes VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (address, port, probe) DO UPDATE SET"
+                " result = excluded.result, a = excluded.a,"
+                " b = excluded.b, checked = excluded.checked,"
+                " used = excluded.used",
+                (row + (now,) for row in pending))
+            db.executemany(
+                "UPDATE probes SET used = ?"
+                " WHERE address = ? AND port = ? AND probe = ?",
+                ((now, *key) for key in used))
+            # drop the least recently used entries past max_entries.
+            db.execute(
+                "DELETE FROM probes WHERE (address, port, probe) IN"
+                " (SELECT address, port, probe FROM probes ORDER BY used"
+                " LIMIT max((SELECT count(*) FROM probes) - ?, 0))",
+                (max_entries,))
+        db.close()
+    except sqlite3.Error as e:
+        log.error(f"[cache]: unable to write the probe cache "
+                  f"{cache.path}: {e}")
+        return
+    log.info(f"[cache]: served {used.__len__()} probes, "
+             f"stored {pending.__len__()}")
@@ -0,0 +1,157 @@
+"""
+Resolves the hostnames of the servers before any of them are scanned,
+so that ping, the port scanner and the HTTP probe don't each resolve
+the same name again for every port.
+
+Resolved addresses are cached in memory with a TTL:
+```py
+    resolver.cache.entries = {
+        "localhost": ("127.0.0.1", 1700000000.0)  # (address, expiry)
+    }
+```
+and can be kept on disk between runs with the --dns-cache argument.
+"""
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import sat.modules.log as log
+    import sat.modules.toml as toml
+except ModuleNotFoundError:
+    import modules.log as log
+    import modules.toml as toml
+
+
+class cache:
+    """
+    hostname->(address, unix time that the address expires at)
+    """
+    entries = {}
+    lock = threading.Lock()
+
+
+def get_cache_path() -> str:
+    """
+    The on-disk cache lives next to the default servers.toml
+    """
+    return os.path.join(os.path.dirname(toml.get_toml_path()),
+                        "dns_cache.json")
+
+
+def is_address(host: str) -> bool:
+    """
+    Checks if the host is already an IP address.
+    """
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def lookup(hostname: str):
+    """
+    Returns the cached address of the hostname, or None if it is
+    missing or expired.
+    """
+    with cache.lock:
+        entry = cache.entries.get(hostname)
+    if entry is None or entry[1] < time.time():
+        return None
+    return entry[0]
+
+
+def resolve(hostname: str, ttl=300.0):
+    """
+    Resolves the hostname to a single address, preferring IPv4.
+    Returns None if the hostname cannot be resolved.
+    """
+    if is_address(hostname):
+        return hostname
+
+    address = lookup(hostname)
+    if address is not None:
+        log.info(f"[resolver]: {hostname}->{address} (cached)")
+        return address
+
+    try:
+        records = socket.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        log.error(f"[resolver]: unable to resolve {hostname}: {e}")
+        return None
+
+    # sorts AF_INET records first
+    records.sort(key=lambda record: record[0] != socket.AF_INET)
+    address = records[0][4][0]
+    with cache.lock:
+        cache.entries[hostname] = (address, time.time() + ttl)
+    log.write(f"[resolver]: {hostname}->{address}")
+    return address
+
+
+def resolve_all(hostnames, ttl=300.0, workers=32) -> dict:
+    """
+    Resolves every unique hostname concurrently.
+    Returns a dictionary of hostname->address (or None).
+    """
+    hostnames = list(dict.fromkeys(hostnames))
+    log.notify(f"[resolver]: resolving {hostnames.__len__()} hostnames...")
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix="sat-resolver") as pool:
+        addresses = pool.map(lambda hostname: resolve(hostname, ttl),
+                             hostnames)
+        return dict(zip(hostnames, addresses))
+
+
+def load(path: str):
+    """
+    Loads the unexpired entries of an on-disk cache. A cache that
+    can't be read, or isn't shaped like one, is ignored as a whole.
+    """
+    now = time.time()
+    fresh = {}
+    try:
+        with open(path, "r") as cache_file:
+            entries = json.load(cache_file)
+        for (hostname, (address, expires)) in entries.items():
+            if not (isinstance(address, str)
+                    and isinstance(expires, (int, float))):
+                raise ValueError(f"{hostname} is not a cached address")
+            if expires > now:
+                fresh[hostname] = (address, expires)
+    except FileNotFoundError:
+        return
+    except (ValueError, TypeError, AttributeError, OSError) as e:
+        log.error(f"[resolver]: ignoring the DNS cache {path}: {e}")
+        return
+
+    with cache.lock:
+        cache.entries.update(fresh)
+    log.info(f"[resolver]: loaded {cache.entries.__len__()} cached hostnames")
+
+
+def save(path: str):
+    """
+    Writes the unexpired entries of the cache to disk. The entries are
+    written to a temporary file first, which then replaces the cache,
+    so that other runs never read a half written cache.
+    """
+    now = time.time()
+    with cache.lock:
+        entries = {hostname: entry for (hostname, entry)
+                   in cache.entries.items() if entry[1] > now}
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as cache_file:
+            json.dump(entries, cache_file)
+        os.replace(temporary, path)
+    except OSError as e:
+        log.error(f"[resolver]: unable to write the DNS cache {path}: {e}")
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
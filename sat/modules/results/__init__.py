@@ -0,0 +1,443 @@
+"""
+This module stores the results of a scan.
+
+Every scanned server gets a `HostRecord`, which are kept inside of a
+`ScanResults` store. Scanner threads update the store through its
+methods, which hold a lock, while the renderers only ever read copies
+of the records returned by `snapshot()`:
+
+```py
+    store = results.ScanResults()
+    store.add_host("127.0.0.1")
+    store.set_status("127.0.0.1", True)
+    store.set_ports("127.0.0.1", [22, 443])
+    store.mark_open("127.0.0.1", 22)
+
+    for record in store.snapshot():
+        print(record.ip, record.open_ports(), record.closed_ports())
+```
+Networks (see the networks module) get a single aggregated record, which
+only holds a member record for each address of the network that is up.
+"""
+import threading
+try:
+    from sat.modules.portranges import PortRanges
+except ModuleNotFoundError:
+    from modules.portranges import PortRanges
+
+# statuses of a host.
+AWAITING = "awaiting"
+UP = True
+DOWN = False
+
+
+class PortStates:
+    """
+    The scanned ports of a host, stored as PortRanges, with a bitmap
+    holding one bit per port that is set once the port is open. Every
+    port that isn't open is considered closed.
+    """
+    __slots__ = ("ports", "bitmap")
+
+    def __init__(self, ports=()):
+        if not isinstance(ports, PortRanges):
+            ports = PortRanges.from_ports(ports)
+        self.ports = ports
+        self.bitmap = bytearray((self.ports.__len__() + 7) // 8)
+
+    def __len__(self):
+        return self.ports.__len__()
+
+    def __index(self, port: int) -> int:
+        return self.ports.index(port)
+
+    def __is_open(self, i: int) -> bool:
+        return bool(self.bitmap[i >> 3] & (1 << (i & 7)))
+
+    def mark_open(self, port: int) -> bool:
+        """
+        Marks the port as open, returns False if it was not scanned,
+        or if it was already open.
+        """
+        i = self.__index(port)
+        if i < 0 or self.__is_open(i):
+            return False
+        self.bitmap[i >> 3] |= 1 << (i & 7)
+        return True
+
+    def is_open(self, port: int) -> bool:
+        i = self.__index(port)
+        return i >= 0 and self.__is_open(i)
+
+    def open(self):
+        return (port for (i, port) in enumerate(self.ports)
+                if self.__is_open(i))
+
+    def closed(self):
+        return (port for (i, port) in enumerate(self.ports)
+                if not self.__is_open(i))
+
+    def copy(self):
+        states = PortStates.__new__(PortStates)
+        states.ports = self.ports
+        states.bitmap = bytearray(self.bitmap)
+        return states
+
+
+class HostRecord:
+    """
+    The results of a single server.
+
+    status: AWAITING, UP or DOWN depending on the ICMP response.
+    ports: the PortStates of the scanned ports, or None if not scanned.
+    http: port->(HTTP status code, time to first byte in ms)
+    rtt: average round trip time (in ms) of the ping.
+    loss: packet loss ratio of the ping.
+    done: whether every probe of the server has finished.
+
+    For networks only:
+    size: the amount of addresses within the network.
+    swept: the amount of addresses that were pinged, the rest were
+    not reached before the deadline.
+    members: address->HostRecord of the addresses that are up.
+    """
+    __slots__ = ("ip", "status", "ports", "http", "rtt", "loss",
+                 "done", "size", "swept", "members")
+
+    def __init__(self, ip: str):
+        self.ip = ip
+        self.status = AWAITING
+        self.ports = None
+        self.http = None
+        self.rtt = None
+        self.loss = None
+        self.done = False
+        self.size = None
+        self.swept = None
+        self.members = None
+
+    def is_network(self) -> bool:
+        return self.members is not None
+
+    def open_ports(self) -> list:
+        if self.ports is None:
+            return []
+        return list(self.ports.open())
+
+    def closed_ports(self) -> list:
+        if self.ports is None:
+            return []
+        return list(self.ports.closed())
+
+    def copy(self):
+        record = HostRecord(self.ip)
+        record.status = self.status
+        record.ports = None if self.ports is None else self.ports.copy()
+        record.http = None if self.http is None else dict(self.http)
+        record.rtt = self.rtt
+        record.loss = self.loss
+        record.done = self.done
+        record.size = self.size
+        record.swept = self.swept
+        if self.members is not None:
+            record.members = {address: member.copy() for (address, member)
+                              in self.members.items()}
+        return record
+
+    def __repr__(self):
+        return (f"<HostRecord [{self.ip}] status={self.status} "
+                f"open={self.open_ports()} closed={self.closed_ports()}>")
+
+
+class ScanResults:
+    """
+    Thread-safe store of HostRecords, in the order that the hosts
+    were added. Functions added with subscribe() are called with the
+    ip of the host after every change, changes to the member of a
+    network are reported as a change to the network.
+
+    The hosts are also indexed by their status, so that counts() and
+    page() only cost as much as what they return.
+
+    Once a host is marked as done, its record no longer changes, so
+    that probes which outlive the deadline can't contradict what was
+    already reported.
+    """
+
+    def __init__(self):
+        self.__hosts = {}
+        # status->{ip: None}, ordered by when the host got the status.
+        self.__by_status = {AWAITING: {}, UP: {}, DOWN: {}}
+        # address->(network, member record)
+        self.__members = {}
+        self.__lock = threading.Lock()
+        self.__listeners = []
+        self.__done_listeners = []
+
+    def __len__(self):
+        return self.__hosts.__len__()
+
+    def __contains__(self, ip: str):
+        return ip in self.__hosts
+
+    def subscribe(self, listener):
+        """
+        Calls listener(ip) every time that a host is changed.
+        """
+        self.__listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """
+        Stops calling a listener that was added with subscribe().
+        """
+        # replaced rather than changed in place, as other threads may
+        # be calling the listeners.
+        self.__listeners = [subscribed for subscribed in self.__listeners
+                            if subscribed != listener]
+
+    def subscribe_done(self, listener):
+        """
+        Calls listener(record, network) once a host is marked as done,
+        with a copy of its record. network is the network that the host
+        is a member of, or None.
+        """
+        self.__done_listeners.append(listener)
+
+    def __changed(self, ip: str):
+        # listeners are called outside of the lock, so that they
+        # are able to read the store.
+        for listener in self.__listeners:
+            listener(ip)
+
+    def __update(self, ip: str, update) -> None:
+        with self.__lock:
+            row = ip
+            record = self.__hosts.get(ip)
+            if record is None:
+                (row, record) = self.__members.get(ip, (None, None))
+            if record is None or record.done:
+                return
+            changed = update(record)
+        if changed is not False:
+            self.__changed(row)
+
+    def __index(self, record, status) -> None:
+        """
+        Moves a host to the index of its new status, members of
+        networks are not indexed. Called with the lock held.
+        """
+        if self.__hosts.get(record.ip) is not record:
+            return
+        self.__by_status.get(record.status, {}).pop(record.ip, None)
+        self.__by_status.setdefault(status, {})[record.ip] = None
+
+    def __drop_members(self, network: str, record):
+        """
+        Forgets the members of a network, but not the records that it
+        shares with other hosts. Called with the lock held.
+        """
+        for address in record.members:
+            if self.__members.get(address, (None, None))[0] == network:
+                self.__members.pop(address)
+
+    def add_host(self, ip: str):
+        with self.__lock:
+            previous = self.__hosts.get(ip)
+            if previous is not None:
+                self.__by_status.get(previous.status, {}).pop(ip, None)
+            self.__hosts[ip] = HostRecord(ip)
+            self.__by_status.get(AWAITING)[ip] = None
+        self.__changed(ip)
+
+    def remove_host(self, ip: str):
+        with self.__lock:
+            record = self.__hosts.pop(ip, None)
+            if record is not None:
+                self.__by_status.get(record.status, {}).pop(ip, None)
+            if record is not None and record.members is not None:
+                self.__drop_members(ip, record)
+        self.__changed(ip)
+
+    def reset(self, ip: str):
+        """
+        Puts the record of a host back to how it was before it was
+        scanned, in the same place, so that it can be scanned again.
+        Networks keep their size, but lose their members.
+        """
+        with self.__lock:
+            record = self.__hosts.get(ip)
+            if record is None:
+                return
+            fresh = HostRecord(ip)
+            if record.members is not None:
+                self.__drop_members(ip, record)
+                fresh.size = record.size
+                fresh.swept = 0
+                fresh.members = {}
+            self.__by_status.get(record.status, {}).pop(ip, None)
+            self.__by_status.get(AWAITING)[ip] = None
+            self.__hosts[ip] = fresh
+        self.__changed(ip)
+
+    def clear(self):
+        with self.__lock:
+            ips = list(self.__hosts)
+            self.__hosts.clear()
+            self.__members.clear()
+            for hosts in self.__by_status.values():
+                hosts.clear()
+        for ip in ips:
+            self.__changed(ip)
+
+    def set_network(self, ip: str, size: int):
+        """
+        Turns the record of the host into an aggregated
+        record of a network with `size` addresses.
+        """
+        def update(record):
+            record.size = size
+            record.swept = 0
+            record.members = {}
+        self.__update(ip, update)
+
+    def add_swept(self, network: str, count: int):
+        """
+        Counts `count` more addresses of the network as pinged.
+        """
+        def update(record):
+            if record.members is None:
+                return False
+            record.swept += count
+        self.__update(network, update)
+
+    def add_member(self, network: str, address: str, status=UP,
+                   rtt=None, loss=None) -> bool:
+        """
+        Adds a record for an address of the network. Once added, the
+        address is updated with the same methods as any other host.
+
+        An address that already has a record (it is a server of its own,
+        or a member of another network) shares that record instead, and
+        False is returned: it is already being scanned.
+        """
+        with self.__lock:
+            parent = self.__hosts.get(network)
+            if parent is None or parent.members is None or parent.done:
+                return False
+            record = self.__hosts.get(address)
+            if record is None:
+                (_, record) = self.__members.get(address, (None, None))
+            added = record is None
+            if added:
+                record = HostRecord(address)
+                record.status = status
+                record.rtt = rtt
+                record.loss = loss
+                self.__members[address] = (network, record)
+            parent.members[address] = record
+        self.__changed(network)
+        return added
+
+    def set_status(self, ip: str, status):
+        def update(record):
+            self.__index(record, status)
+            record.status = status
+        self.__update(ip, update)
+
+    def set_ports(self, ip: str, ports):
+        """
+        Sets the ports that are going to be scanned, all of
+        them start out closed.
+        """
+        def update(record):
+            record.ports = PortStates(ports)
+        self.__update(ip, update)
+
+    def mark_open(self, ip: str, port: int):
+        def update(record):
+            if record.ports is None:
+                return False
+            return record.ports.mark_open(port)
+        self.__update(ip, update)
+
+    def record_http(self, ip: str, port: int, status: int, ttfb: float):
+        def update(record):
+            if record.http is None:
+                record.http = {}
+            record.http[port] = (status, ttfb)
+        self.__update(ip, update)
+
+    def record_ping(self, ip: str, rtt: float, loss: float):
+        def update(record):
+            record.rtt = rtt
+            record.loss = loss
+        self.__update(ip, update)
+
+    def mark_done(self, ip: str):
+        """
+        Marks a host (or a member of a network) as done, only
+        the first call for a host is reported.
+        """
+        with self.__lock:
+            network = None
+            record = self.__hosts.get(ip)
+            if record is None:
+                (network, record) = self.__members.get(ip, (None, None))
+            if record is None or record.done:
+                return
+            record.done = True
+            record = record.copy()
+        for listener in self.__done_listeners:
+            listener(record, network)
+
+    def is_done(self, ip: str) -> bool:
+        """
+        Whether a host (or a member of a network) is marked as done.
+        """
+        with self.__lock:
+            record = self.__hosts.get(ip)
+            if record is None:
+                (_, record) = self.__members.get(ip, (None, None))
+            return record is not None and record.done
+
+    def get(self, ip: str):
+        """
+        Returns a copy of the record of the host, or None.
+        """
+        with self.__lock:
+            record = self.__hosts.get(ip)
+            return None if record is None else record.copy()
+
+    def status(self, ip: str):
+        with self.__lock:
+            record = self.__hosts.get(ip)
+            return None if record is None else record.status
+
+    def snapshot(self) -> list:
+        """
+        Returns a consistent copy of every record.
+        """
+        with self.__lock:
+            return [record.copy() for record in self.__hosts.values()]
+
+    def counts(self) -> dict:
+        """
+        Returns the amount of hosts of each status.
+        """
+        with self.__lock:
+            return {status: hosts.__len__() for (status, hosts)
+                    in self.__by_status.items()}
+
+    def page(self, order, limit: int) -> list:
+        """
+        Returns copies of at most `limit` records, the hosts of the
+        first status in `order` first, e.g: (DOWN, AWAITING, UP)
+        """
+        records = []
+        with self.__lock:
+            for status in order:
+                for ip in self.__by_status.get(status, ()):
+                    if records.__len__() >= limit:
+                        return records
+                    records.append(self.__hosts.get(ip).copy())
+        return records
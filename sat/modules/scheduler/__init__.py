@@ -0,0 +1,89 @@
+"""
+Decides when each server is scanned again with --daemon.
+
+Every server is kept in a heap, ordered by the time that it is due.
+The main thread sleeps until the first server is due, takes every
+server that is due within the next `window` seconds, scans them, and
+puts them back `interval` seconds (give or take the jitter) after the
+scan started:
+```py
+    timers = scheduler.Scheduler(jitter=0.1)
+    timers.add(target, 60)
+    while batch := timers.due():
+        started = time.monotonic()
+        scan(batch)
+        timers.reschedule(batch, started)
+```
+The jitter spreads servers with the same interval apart over time,
+so that their scans don't all land at once.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class Scheduler:
+    """
+    A heap of (due, order, interval, item), due being a time.monotonic()
+    value. `order` keeps items that are due at the same time in the
+    order that they were added, and never compares the items themselves.
+    """
+
+    def __init__(self, jitter=0.1, window=1.0):
+        self.heap = []
+        self.order = itertools.count()
+        self.jitter = jitter
+        self.window = window
+        self.stopped = threading.Event()
+
+    def __len__(self):
+        return self.heap.__len__()
+
+    def next_interval(self, interval: float) -> float:
+        """
+        The interval, give or take the jitter (a fraction of it).
+        """
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def add(self, item, interval: float, due=None):
+        """
+        Adds an item that is due every `interval` seconds, at once
+        if no due time is given.
+        """
+        if due is None:
+            due = time.monotonic()
+        heapq.heappush(self.heap, (due, next(self.order), interval, item))
+
+    def due(self) -> list:
+        """
+        Waits until the first item is due, and returns (item, interval)
+        of every item that is due within the window. Returns an empty
+        list once stopped.
+        """
+        while self.heap and not self.stopped.is_set():
+            wait = self.heap[0][0] - time.monotonic()
+            if wait > 0:
+                # woken up early by stop()
+                self.stopped.wait(wait)
+                continue
+
+            until = time.monotonic() + self.window
+            batch = []
+            while self.heap and self.heap[0][0] <= until:
+                (_, _, interval, item) = heapq.heappop(self.heap)
+                batch.append((item, interval))
+            return batch
+        return []
+
+    def reschedule(self, batch: list, started: float):
+        """
+        Puts the items of a batch back, due an interval after `started`.
+        An item whose scan took longer than its interval is due at once.
+        """
+        for (item, interval) in batch:
+            self.add(item, interval, started + self.next_interval(interval))
+
+    def stop(self):
+        self.stopped.set()
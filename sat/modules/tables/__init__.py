@@ -5,27 +5,17 @@ to STDOUT/STDERR.
 try:
     import sat.modules.ansi as ansi
     import sat.modules.log as log
+    from sat.modules.portranges import format_ports
+    from sat.modules.results import AWAITING, UP, DOWN
 except ModuleNotFoundError:
     import modules.ansi as ansi
     import modules.log as log
+    from modules.portranges import format_ports
+    from modules.results import AWAITING, UP, DOWN
 
+import shutil
 import sys
-
-
-class UpdateTables():
-    """
-    This updates the port maps for the table.
-    """
-    open_ports = {}
-    closed_ports = {}
-    connections = {}
-
-    def __init__(self, open_ports: {},
-                 closed_ports: {},
-                 connections: {}):
-        UpdateTables.open_ports = open_ports
-        UpdateTables.closed_ports = closed_ports
-        UpdateTables.connections = connections
+import threading
 
 
 class __globals:
@@ -56,16 +46,59 @@ class __globals:
         # this is the bottom bar.
         bottom = f"{table_color}┗{ip_bar}┻{connected_bar}┛{ansi.END}"
 
+    # the Renderer of the table, see get_renderer()
+    renderer = None
+
+
+# order of the rows within the viewport, failures first.
+VIEWPORT_ORDER = (DOWN, AWAITING, UP)
+
+
+def __format_open_ports(record, ports: list) -> str:
+    """
+    Formats the open ports, appending the HTTP status code and
+    time to first byte to the ports that responded over HTTP.
+    """
+    http = record.http or {}
+    formatted = []
+    for port in ports:
+        if port in http:
+            (status, ttfb) = http.get(port)
+            formatted.append(f"{port} (HTTP {status}, {ttfb:.0f}ms)")
+        else:
+            formatted.append(f"{port}")
+    return f"[{', '.join(formatted)}]"
+
+
+def __format_network(record) -> tuple:
+    """
+    Networks only have a single row in the table, which counts the
+    addresses that are up, and lists the ports open on any of them.
+    Addresses that were not pinged before the deadline are not down.
+    e.g: 3/254 up [22, 80] :: 200 down, 51 unscanned
+    """
+    up = record.members.__len__()
+    unscanned = record.size - record.swept
+    open_ports = set()
+    for member in record.members.values():
+        open_ports.update(member.open_ports())
+    down = f"{record.swept - up} down"
+    if unscanned:
+        down += f", {unscanned} unscanned"
+    return (f"{up}/{record.size} up {format_ports(sorted(open_ports))}",
+            down)
+
 
-def __draw_ip_table_format(ip_address: str,
-                           count: int, sysfile):
+def __draw_ip_table_format(record, count: int) -> tuple:
     """
-    Draws out the table. Only available within this specific module.
-    sysfile=sys.stdout || sys.stderr
+    Formats a row of the table. Only available within this specific module.
+    record=results.HostRecord
+    Returns the (divider, entry) lines of the row.
     """
-    ports = UpdateTables.open_ports.get(ip_address)
-    closed_ports = UpdateTables.closed_ports.get(ip_address)
-    responsive = UpdateTables.connections.get(ip_address)[0]
+    ip_address = record.ip
+    ports = record.open_ports()
+    closed_ports = record.closed_ports()
+    responsive = record.status
     # if the closed ports or open ports
     # are an empty list, format the list
     # to look pretty.
@@ -73,6 +106,13 @@ def __draw_ip_table_format(ip_address: str,
         closed_ports = None
     if ports == []:
         ports = None
+    if ports is not None:
+        ports = __format_open_ports(record, ports)
+    if closed_ports is not None:
+        # collapse wide port ranges, e.g: [22, 8000-8100]
+        closed_ports = format_ports(closed_ports)
+    if record.is_network():
+        (ports, closed_ports) = __format_network(record)
 
     # fix ip address length
     if ip_address.__len__() > __globals.Text.max_ip_length:
@@ -128,13 +168,12 @@ def __draw_ip_table_format(ip_address: str,
     connected = f"{connected}{con_spacing}"
 
     # Table Divider:
-    print(f"{__globals.Text.table_color}{left_corner}{ip_bar}{
-        divider}{connected_bar}{closer}{ansi.END}", file=sysfile)
+    divider = f"{__globals.Text.table_color}{left_corner}{ip_bar}{
+        divider}{connected_bar}{closer}{ansi.END}"
     # Table Entry:
-    print(f"{__globals.Text.table_color}┃{ip_address}┃{
-        connected} ┃ ==> {ansi.GREEN}{ports} :: {ansi.RED}{closed_ports}{ansi.END}",
-        file=sysfile)
-    __globals.Text.lines_written += 2
+    entry = f"{__globals.Text.table_color}┃{ip_address}┃{
+        connected} ┃ ==> {ansi.GREEN}{ports} :: {ansi.RED}{closed_ports}{ansi.END}"
+    return (divider, entry)
 
 
 def clear_table(stderr: bool):
@@ -143,43 +182,284 @@ def clear_table(stderr: bool):
     the parameter 'output'
     maps to stdout or stdin.
     """
+    sysfile = sys.stdout
     if stderr:
-        log.notify("CLEARING TABLES")
-        for i in range(__globals.Text.lines_written):
-            sys.stderr.write('\x1b[1A')
-            sys.stderr.write('\x1b[2K')
-        __globals.Text.lines_written = 0
-    else:
-        log.notify("CLEARING TABLES")
-        for i in range(__globals.Text.lines_written):
-            sys.stdout.write('\x1b[1A')
-            sys.stdout.write('\x1b[2K')
-        __globals.Text.lines_written = 0
+        sysfile = sys.stderr
+    log.notify("CLEARING TABLES")
+    # a single write, rather than one per line.
+    if get_lines():
+        sysfile.write(f"\x1b[{get_lines()}A\r\x1b[J")
+        sysfile.flush()
+    __globals.Text.lines_written = 0
+    # the next table is drawn in full.
+    if __globals.renderer is not None:
+        __globals.renderer.frame = []
 
 
 def get_lines():
+    if __globals.renderer is not None:
+        return __globals.renderer.frame.__len__()
     return __globals.Text.lines_written
 
 
-def draw_table(initial=False, stderr=False):
+def format_row(record, count: int) -> tuple:
     """
-    This function updates the table with values, and draws the table
-    this value is called in main.py returns the count of the lines written.
+    Returns the (divider, entry) lines of the row of the record,
+    count is the position of the row within the table.
     """
+    return __draw_ip_table_format(record, count)
 
-    count = 0
-    if not initial:
-        clear_table(stderr)
 
-    # we have to print the top and
-    # bottom headers outside of the table.
-    sysfile = sys.stdout
-    if stderr:
-        sysfile = sys.stderr
+def table_edges() -> tuple:
+    """
+    Returns the (header, bottom) lines of the table.
+    """
+    return (__globals.Text.table_header, __globals.Text.bottom)
+
+
+def format_summary(counts: dict, shown: int) -> str:
+    """
+    The footer of the viewport, e.g:
+    1000 servers: 950 up, 20 down, 30 awaiting (showing 20, failures first)
+    """
+    total = sum(counts.values())
+    return (f" {total} servers: {ansi.GREEN}{counts.get(UP, 0)} up{ansi.END}, "
+            f"{ansi.RED}{counts.get(DOWN, 0)} down{ansi.END}, "
+            f"{ansi.LIGHT_BLUE}{counts.get(AWAITING, 0)} awaiting{ansi.END} "
+            f"(showing {shown}, failures first)")
+
+
+class Renderer:
+    """
+    Keeps the lines of the table that is on the screen (the previous
+    frame), and the rows that changed since, which are reported by the
+    results.ScanResults store. Rendering only rewrites the entries of
+    the rows that changed, by moving the cursor up to them, with a
+    single write of the whole update.
+
+    viewport: "never" draws every row. "always" only draws the rows
+    that fit on the terminal, failures first, with a summary footer.
+    "auto" does the same, but only while the table doesn't fit on the
+    terminal, and draws the final table in full.
+    """
+
+    def __init__(self, results, stderr=False, viewport="never"):
+        self.results = results
+        self.stderr = stderr
+        self.viewport = viewport
+        # the lines on the screen, and ip->index of the entry line.
+        self.frame = []
+        self.rows = {}
+        # the height of the viewport on the screen, 0 if none.
+        self.height = 0
+        self.changed = set()
+        self.lock = threading.Lock()
+        results.subscribe(self.__changed)
+
+    def __changed(self, ip: str):
+        with self.lock:
+            self.changed.add(ip)
+
+    def close(self):
+        """
+        Stops collecting the changes of the results.
+        """
+        self.results.unsubscribe(self.__changed)
+
+    def __take_changes(self) -> set:
+        with self.lock:
+            (changed, self.changed) = (self.changed, set())
+        return changed
+
+    def __full_frame(self) -> list:
+        (header, bottom) = table_edges()
+        self.rows = {}
+        frame = [header]
+        for (count, record) in enumerate(self.results.snapshot()):
+            frame.extend(format_row(record, count))
+            self.rows[record.ip] = frame.__len__() - 1
+        frame.append(bottom)
+        return frame
+
+    def __viewport_height(self) -> int:
+        """
+        Returns the amount of lines that the viewport may use,
+        or 0 if the whole table should be drawn.
+        """
+        if self.viewport == "never":
+            return 0
+        if self.viewport == "auto" and not self.__sysfile().isatty():
+            return 0
+        lines = shutil.get_terminal_size().lines - 1
+        table_height = self.results.__len__()*2 + 2
+        if self.viewport == "auto" and table_height <= lines:
+            return 0
+        # at least a single row, and the footer.
+        return max(lines, 5)
+
+    def __viewport_frame(self, height: int) -> list:
+        """
+        Only the rows that fit within the height, so this costs as
+        much as the size of the terminal, not of the inventory.
+        """
+        (header, bottom) = table_edges()
+        self.rows = {}
+        records = self.results.page(VIEWPORT_ORDER, (height - 3) // 2)
+        frame = [header]
+        for (count, record) in enumerate(records):
+            frame.extend(format_row(record, count))
+        frame.append(bottom)
+        frame.append(format_summary(self.results.counts(),
+                                    records.__len__()))
+        return frame
+
+    def draw(self, clear=True, final=False):
+        """
+        Draws the whole table, replacing the previous frame if clear.
+        The final table is only drawn within the viewport if it is
+        "always" used.
+        """
+        self.__take_changes()
+        output = []
+        if clear and self.frame:
+            log.notify("CLEARING TABLES")
+            # move up to the top of the frame, and clear the screen below.
+            output.append(f"\x1b[{self.frame.__len__()}A\r\x1b[J")
+        self.height = self.__viewport_height()
+        if final and self.viewport != "always":
+            self.height = 0
+        if self.height:
+            self.frame = self.__viewport_frame(self.height)
+        else:
+            self.frame = self.__full_frame()
+        output.append("\n".join(self.frame) + "\n")
+        self.__write(output)
+
+    def render(self):
+        """
+        Rewrites the rows that changed since the previous frame.
+        """
+        changed = self.__take_changes()
+        if not self.frame:
+            return self.draw(clear=False)
+
+        height = self.__viewport_height()
+        if height != self.height:
+            # the terminal was resized, or the table outgrew it.
+            return self.draw()
+        if not changed:
+            return
+        if height:
+            return self.__rewrite(self.__viewport_frame(height))
+
+        output = []
+        height = self.frame.__len__()
+        terminal_lines = shutil.get_terminal_size().lines
+        for ip in changed:
+            record = self.results.get(ip)
+            line = self.rows.get(ip)
+            if record is None or line is None:
+                # a host was added or removed, the rows have moved.
+                return self.draw()
+            (_, entry) = format_row(record, (line - 2) // 2)
+            if entry == self.frame[line]:
+                continue
+            # the cursor sits below the frame: move up to the entry,
+            # rewrite it, and move back down.
+            distance = height - line
+            if distance >= terminal_lines:
+                # the entry scrolled off the screen, the cursor can't
+                # move up to it.
+                return self.draw()
+            self.frame[line] = entry
+            output.append(f"\x1b[{distance}A\r\x1b[2K{entry}"
+                          f"\x1b[{distance}B\r")
+        self.__write(output)
+
+    def __rewrite(self, frame: list):
+        """
+        Rewrites the lines of the previous frame that differ from
+        the new frame of the same height.
+        """
+        if frame.__len__() != self.frame.__len__():
+            return self.draw()
+        output = []
+        height = self.frame.__len__()
+        for (line, (old, new)) in enumerate(zip(self.frame, frame)):
+            if old == new:
+                continue
+            distance = height - line
+            output.append(f"\x1b[{distance}A\r\x1b[2K{new}"
+                          f"\x1b[{distance}B\r")
+        self.frame = frame
+        self.__write(output)
+
+    def __sysfile(self):
+        if self.stderr:
+            return sys.stderr
+        return sys.stdout
+
+    def __write(self, output: list):
+        if output:
+            sysfile = self.__sysfile()
+            sysfile.write("".join(output))
+            sysfile.flush()
+
+
+def get_renderer(results, stderr=False, viewport=None) -> Renderer:
+    """
+    Returns the renderer of the results, creating it on first use.
+    viewport: changes the viewport mode of the renderer (see Renderer).
+    """
+    renderer = __globals.renderer
+    if renderer is None or renderer.results is not results:
+        if renderer is not None:
+            renderer.close()
+        renderer = Renderer(results, stderr)
+        __globals.renderer = renderer
+    if viewport is not None:
+        renderer.viewport = viewport
+    return renderer
+
+
+def draw_table(results, initial=False, stderr=False):
+    """
+    This function draws the table from the results.ScanResults store.
+    The initial table is drawn in full, every later call only rewrites
+    the rows that changed since (see Renderer).
+    This value is called in main.py returns the count of the lines written.
+    """
+    renderer = get_renderer(results, stderr)
+    if initial:
+        renderer.draw(clear=False)
+    else:
+        renderer.render()
+    return get_lines()
+
+
+class RenderLoop(threading.Thread):
+    """
+    Redraws the rows of the table that changed at most `fps` times a
+    second, from a thread of its own. Every update that comes in
+    between two frames is coalesced into the next frame, so rendering
+    doesn't cost more as more servers complete, and the table keeps
+    moving while a slow server is still being scanned.
+    """
+
+    def __init__(self, results, stderr=False, fps=10.0, viewport=None):
+        super().__init__(name="sat-render", daemon=True)
+        self.renderer = get_renderer(results, stderr, viewport)
+        self.interval = 1 / fps
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.renderer.render()
 
-    print(__globals.Text.table_header, file=sysfile)
-    for ip_address in UpdateTables.connections.keys():
-        __draw_ip_table_format(ip_address, count, sysfile)
-        count += 1
-    print(__globals.Text.bottom, file=sysfile)
-    __globals.Text.lines_written += 2
+    def stop(self):
+        """
+        Stops the loop, and draws the final table.
+        """
+        self.stopped.set()
+        self.join()
+        self.renderer.draw(final=True)
@@ -82,8 +82,13 @@ def write_toml(filename: str, server_count=5):
             # gives the user an example
             toml.write('\n# [server.{your_name_here}]\n')
             toml.write('\n# ip = "hostname/url/ip address": type=string\n')
-            toml.write('\n# ports = [22,8080,443] : accepts list types\n')
+            toml.write(
+                '\n# ports = [22,8080,443,"8000-8100","web"] : accepts list'
+                ' types, port ranges, "top-100" and group names\n')
             toml.write('\n# scan = type=boolean values (true or false)\n')
+            toml.write(
+                '\n# http_ports = [80,8080] : open ports to probe over HTTP,'
+                ' all of them if omitted.\n')
 
             # formatted exactly as is in the toml file
             toml.write('''